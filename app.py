@@ -1,6 +1,9 @@
 import streamlit as st
-from pagina_importaciones import pagina_importaciones
-from pagina_ventas import pagina_ventas
+import instrumentacion
+import panel_admin
+
+# Las páginas (y con ellas pandas, Plotly y los datos) se importan recién al
+# navegar a cada una, así la barra lateral se muestra antes en el primer inicio
 
 # Configuración de la página (debe estar al inicio del archivo)
 st.set_page_config(page_title="Dashboard de Ventas", layout="wide")
@@ -11,9 +14,23 @@ st.set_page_config(page_title="Dashboard de Ventas", layout="wide")
 # Menú de navegación lateral
 page = st.sidebar.selectbox("Selecciona una página", ["Importaciones", "Ventas"])
 
-# Mostrar la página seleccionada
-if page == "Importaciones":
-    pagina_importaciones()
-elif page == "Ventas":
-    pagina_ventas()
+# Revalidar los datos compartidos contra GitHub sin esperar a que venzan
+if st.sidebar.button("Actualizar datos"):
+    import registro_datos
+    errores = registro_datos.refrescar(forzar=True)
+    if errores:
+        st.sidebar.warning(f"No se pudieron actualizar {', '.join(errores)}: se muestran los datos anteriores.")
+
+# Mostrar la página seleccionada, midiendo sus etapas (y perfilándola si lo pide un admin)
+admin = panel_admin.es_admin()
+with instrumentacion.ejecucion(perfilar=admin and panel_admin.perfilar_activado()) as ejecucion:
+    with instrumentacion.etapa(f"pagina.{page}"):
+        if page == "Importaciones":
+            from pagina_importaciones import pagina_importaciones
+            pagina_importaciones()
+        elif page == "Ventas":
+            from pagina_ventas import pagina_ventas
+            pagina_ventas()
 
+if admin:
+    panel_admin.mostrar(ejecucion)
@@ -0,0 +1,66 @@
+"""Compara el filtro por máscara booleana con IndiceFiltros.
+
+Uso: python -m benchmarks.bench_filtros [filas ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from indice_filtros import IndiceFiltros
+
+COLUMNAS = ['Categoria', 'Tipo de Venta', 'Región de Envío', 'Estado del Pago', 'Nombre de Pago']
+
+
+def frame_sintetico(filas, seed=0):
+    rng = np.random.default_rng(seed)
+    inicio = pd.Timestamp('2024-01-01')
+    return pd.DataFrame({
+        'ID': np.sort(rng.integers(1000, 1000 + filas // 3 + 1, filas)),
+        'Fecha': inicio + pd.to_timedelta(np.sort(rng.integers(0, 365 * 24 * 60, filas)), unit='min'),
+        'Categoria': rng.choice([f'Cat{i}' for i in range(20)], filas),
+        'Tipo de Venta': rng.choice(['Detalle', 'Mayorista'], filas, p=[0.8, 0.2]),
+        'Región de Envío': rng.choice([f'Region{i}' for i in range(16)], filas),
+        'Estado del Pago': rng.choice(['Pagado', 'Cancelada'], filas, p=[0.9, 0.1]),
+        'Nombre de Pago': rng.choice(['Transferencia Bancaria', 'Paga con Webpay'], filas),
+    })
+
+
+def por_mascara(df, desde, hasta, filtros):
+    mask = (df['Fecha'] >= desde) & (df['Fecha'] <= hasta)
+    for col, valores in filtros.items():
+        mask &= df[col].isin(valores)
+    return np.flatnonzero(mask.to_numpy())
+
+
+def medir(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t)
+    return min(tiempos), resultado
+
+
+def main(tamanos):
+    casos = {
+        '1 día': (pd.Timestamp('2024-06-01'), pd.Timestamp('2024-06-01 23:59:59'), {}),
+        '1 día + categoría': (pd.Timestamp('2024-06-01'), pd.Timestamp('2024-06-01 23:59:59'), {'Categoria': ['Cat3']}),
+        '1 mes + región + pago': (pd.Timestamp('2024-06-01'), pd.Timestamp('2024-06-30 23:59:59'),
+                                  {'Región de Envío': ['Region1', 'Region2'], 'Estado del Pago': ['Pagado']}),
+        'todo el año': (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-12-31 23:59:59'), {}),
+    }
+    print(f"{'filas':>10} {'caso':<24} {'resultado':>10} {'máscara (ms)':>13} {'índice (ms)':>12}")
+    for filas in tamanos:
+        df = frame_sintetico(filas)
+        indice = IndiceFiltros(df, COLUMNAS)
+        for nombre, (desde, hasta, filtros) in casos.items():
+            t_mascara, esperado = medir(lambda: por_mascara(df, desde, hasta, filtros))
+            t_indice, obtenido = medir(lambda: indice.seleccionar(desde, hasta, filtros))
+            assert np.array_equal(esperado, obtenido)
+            print(f"{filas:>10} {nombre:<24} {len(obtenido):>10} {t_mascara * 1000:>13.2f} {t_indice * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,366 @@
+"""Mide las etapas del dashboard con datos sintéticos y guarda los resultados en JSON.
+
+Genera (si no existen) los CSV de cada tamaño en benchmarks/datos/, los sirve
+con un servidor HTTP local y llama directamente a las funciones de carga,
+preprocesamiento, filtros, KPIs y gráficos. Con --apptest también mide las
+páginas completas con streamlit.testing.AppTest.
+
+Uso: python -m benchmarks.ejecutar [--tamanos 10k 100k ...] [--salida ARCHIVO]
+                                   [--comparar BASE.json] [--apptest]
+"""
+import argparse
+import contextlib
+import email.utils
+import functools
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pyarrow.feather as feather
+
+import cubo_ventas
+import descargas
+import graficos
+import indice_filtros
+import instrumentacion
+import motor_ventas
+import preprocesamiento
+import series_tiempo
+import venta_lotes
+from benchmarks import generar_datos
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_DATOS = os.path.join(DIR_BENCHMARKS, 'datos')
+DIR_RESULTADOS = os.path.join(DIR_BENCHMARKS, 'resultados')
+APP = os.path.join(os.path.dirname(DIR_BENCHMARKS), 'app.py')
+TAMANOS_POR_DEFECTO = ['10k', '100k', '1M']
+# Segundos entre muestras de la memoria residente durante cada etapa
+INTERVALO_RSS = 0.005
+
+
+class _Servidor(http.server.SimpleHTTPRequestHandler):
+    """Archivos estáticos con 304 y rangos "bytes=N-", como raw.githubusercontent.com."""
+
+    # Conexiones keep-alive, para que la sesión de descargas las reutilice
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _modificado(self, ruta):
+        try:
+            desde = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+        except (TypeError, ValueError):
+            return True
+        return int(os.stat(ruta).st_mtime) > desde
+
+    def send_head(self):
+        ruta = self.translate_path(self.path)
+        rango = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if rango is None or not os.path.isfile(ruta) or not self._modificado(ruta):
+            return super().send_head()
+        inicio, tamano = int(rango.group(1)), os.path.getsize(ruta)
+        if inicio >= tamano:
+            self.send_error(416)
+            return None
+        f = open(ruta, 'rb')
+        f.seek(inicio)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(ruta))
+        self.send_header('Content-Range', f'bytes {inicio}-{tamano - 1}/{tamano}')
+        self.send_header('Content-Length', str(tamano - inicio))
+        self.send_header('Last-Modified', self.date_time_string(os.stat(ruta).st_mtime))
+        self.end_headers()
+        return f
+
+
+@contextlib.contextmanager
+def servidor_local(directorio):
+    """Servidor HTTP local que responde como raw.githubusercontent.com (incluye 304)."""
+    handler = functools.partial(_Servidor, directory=directorio)
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def _rss():
+    return instrumentacion.memoria_proceso() or 0
+
+
+class Medicion:
+    """Tiempo y memoria residente de cada etapa.
+
+    El pico de cada etapa sale de muestrear el RSS actual mientras corre (el
+    máximo del proceso, ru_maxrss, no baja y repetiría el de la etapa más grande).
+    Sin /proc/self/statm (fuera de Linux) memoria_proceso devuelve ese máximo.
+    """
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        rss_inicio = _rss()
+        pico = [rss_inicio]
+        fin = threading.Event()
+
+        def muestrear():
+            while not fin.wait(INTERVALO_RSS):
+                pico[0] = max(pico[0], _rss())
+
+        hilo = threading.Thread(target=muestrear, daemon=True)
+        hilo.start()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            fin.set()
+            hilo.join()
+        pico_etapa = max(pico[0], _rss())
+        self.etapas[nombre] = {
+            'segundos': round(segundos, 6),
+            'pico_rss_mb': round(pico_etapa / 2**20, 1),
+            'aumento_rss_mb': round((pico_etapa - rss_inicio) / 2**20, 1),
+        }
+
+
+def _datos(nombre, lineas):
+    directorio = os.path.join(DIR_DATOS, nombre)
+    if not os.path.exists(os.path.join(directorio, 'importaciones.csv')):
+        print(f"Generando {nombre} ({lineas} líneas) en {directorio}...")
+        generar_datos.generar(directorio, lineas)
+    return directorio
+
+
+def _graficos_ventas(cubo, seleccion):
+    sales_data = cubo.agrupar(seleccion, ['Categoria', 'SKU del Producto'], ['Ventas Netas', 'Cantidad']).rename(
+        columns={'Ventas Netas': 'Ventas_Netas', 'Cantidad': 'Cantidad_Productos'}
+    ).reset_index()
+    graficos.figura_ventas_sku(sales_data)
+    series = series_tiempo.agregar_series(cubo.celdas.loc[seleccion], 'Día', columna_fecha='Dia')
+    px.line(series, x='Fecha', y=['Ventas_Totales', 'Ventas_Netas', 'Ganancia_Neta'])
+    top = cubo.agrupar(seleccion, 'SKU del Producto', ['Cantidad'])['Cantidad'].sort_values(ascending=False).head(10)
+    px.bar(top, x=top.index, y=top.values)
+    descuentos = cubo.agrupar(seleccion, 'Categoria', ['Descuentos'])['Descuentos'].sort_values(ascending=False)
+    px.bar(descuentos, x=descuentos.index, y=descuentos.values)
+
+
+def _importaciones(ruta, venta_categorias):
+    df = pd.read_csv(ruta)
+    df['PRODUCTO'] = df['PRODUCTO'].fillna('Sin especificar')
+    fecha = df['Fecha_Importacion'].iloc[-1]
+    tabla = venta_categorias.reset_index()
+    agrupadas = tabla[tabla['Fecha_Importacion'] == fecha].rename(columns={
+        'CATEGORIA': 'Categoria', 'STOCK INICIAL': 'cantidad', 'Cantidad Vendida': 'vendida', '% Vendido': 'porcentaje',
+    })
+    graficos.figura_importaciones(agrupadas, fecha)
+    df.groupby(['Fecha_Importacion', 'CATEGORIA', 'PRODUCTO'], dropna=False)['STOCK INICIAL'].sum()
+
+
+def _medir_ingesta(directorio, m):
+    """Refresco después de anexar el último 1% de datasource.csv (el corte suele caer dentro de una orden)."""
+    with tempfile.TemporaryDirectory() as servido, tempfile.TemporaryDirectory() as dir_cache:
+        shutil.copy(os.path.join(directorio, 'categorias.csv'), servido)
+        ruta = os.path.join(servido, 'datasource.csv')
+        with open(os.path.join(directorio, 'datasource.csv'), 'rb') as origen, open(ruta, 'wb') as destino:
+            origen.seek(int(os.path.getsize(origen.name) * 0.99))
+            origen.readline()
+            corte = origen.tell()
+            origen.seek(0)
+            destino.write(origen.read(corte))
+            with servidor_local(servido) as url:
+                version_anterior, df = preprocesamiento.cargar_ventas(url_base=url, dir_cache=dir_cache)
+                cubo = cubo_ventas.CuboVentas.construir(df)
+                indice = indice_filtros.IndiceFiltros(df, cubo_ventas.DIMENSIONES[1:] + ['ID'])
+                destino.write(origen.read())
+                destino.flush()
+                # Last-Modified tiene resolución de segundos
+                os.utime(ruta, (time.time() + 2, time.time() + 2))
+                with m.etapa('ingesta_incremental'):
+                    version, df = preprocesamiento.cargar_ventas(url_base=url, dir_cache=dir_cache)
+                # El snapshot se escribe en segundo plano: se espera para medir los agregados por separado
+                preprocesamiento.esperar_snapshots()
+                incremento = preprocesamiento.incremento(version_anterior, version)
+                if incremento is None:
+                    raise RuntimeError("La ingesta no fue incremental")
+                with m.etapa('cubo_incremental'):
+                    cubo.actualizar(incremento.quitadas, incremento.nuevas)
+                with m.etapa('indice_incremental'):
+                    indice.anexar(df, incremento.nuevas.index[0])
+
+
+def medir_tamano(nombre, lineas):
+    directorio = _datos(nombre, lineas)
+    m = Medicion()
+    with servidor_local(directorio) as url, tempfile.TemporaryDirectory() as dir_cache:
+        archivos = ['datasource.csv', 'categorias.csv', 'importaciones.csv']
+        with m.etapa('descarga'):
+            futuros = {a: descargas.en_paralelo(descargas.descargar, a, url_base=url, dir_cache=dir_cache) for a in archivos}
+            fuentes = {a: futuro.result() for a, futuro in futuros.items()}
+        with m.etapa('descarga_condicional'):
+            for a in archivos:
+                descargas.descargar(a, url_base=url, dir_cache=dir_cache)
+        with m.etapa('parseo'):
+            df_main = preprocesamiento.leer_datasource(fuentes['datasource.csv'].ruta)
+            df_categorias = pd.read_csv(fuentes['categorias.csv'].ruta)
+        with m.etapa('preproceso'):
+            df = preprocesamiento.preprocess_data(df_main, df_categorias)
+        del df_main
+        with m.etapa('snapshot_escritura'):
+            preprocesamiento._guardar_snapshot(df, dir_cache, 'benchmark')
+        with m.etapa('snapshot_lectura'):
+            feather.read_feather(preprocesamiento._ruta_snapshot(dir_cache, 'benchmark'))
+        with m.etapa('cubo'):
+            cubo = cubo_ventas.CuboVentas.construir(df)
+        columnas = cubo_ventas.DIMENSIONES[1:] + ['ID']
+        with m.etapa('indice'):
+            indice = indice_filtros.IndiceFiltros(df, columnas)
+
+        # Filtro típico: el último mes, una región y pagos confirmados
+        hasta = df['Fecha'].max().normalize() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+        desde = hasta.normalize() - pd.Timedelta(days=30)
+        filtros = {'Región de Envío': ['Metropolitana'], 'Estado del Pago': ['Pagado']}
+        with m.etapa('filtro_mascara'):
+            mask = (df['Fecha'] >= desde) & (df['Fecha'] <= hasta)
+            for col, valores in filtros.items():
+                mask &= df[col].isin(valores)
+            df[mask]
+        with m.etapa('filtro_indice'):
+            df.iloc[indice.seleccionar(desde, hasta, filtros)]
+        with m.etapa('kpis'):
+            seleccion = cubo.seleccionar(desde.normalize(), hasta.normalize(), filtros)
+            cubo.totales(seleccion)
+        with m.etapa('sqlite_base'):
+            motor = motor_ventas.MotorSQLite.abrir(df, df_categorias, pd.read_csv(fuentes['importaciones.csv'].ruta),
+                                                   dir_cache, 'benchmark')
+        with m.etapa('kpis_sqlite'):
+            motor.totales(motor.seleccionar(desde, hasta, filtros))
+        with m.etapa('graficos_ventas'):
+            _graficos_ventas(cubo, seleccion)
+        with m.etapa('venta_lotes'):
+            venta_categorias = venta_lotes.por_categoria(
+                venta_lotes.calcular(pd.read_csv(fuentes['importaciones.csv'].ruta), df)
+            )
+        with m.etapa('importaciones'):
+            _importaciones(fuentes['importaciones.csv'].ruta, venta_categorias)
+    _medir_ingesta(directorio, m)
+    return {'lineas': lineas, 'filas': int(len(df)), 'celdas_cubo': int(len(cubo.celdas)),
+            'memoria_ventas_mb': round(df.memory_usage(deep=True).sum() / 2**20, 1), 'etapas': m.etapas}
+
+
+def medir_paginas(nombre, lineas):
+    """Tiempo de la primera ejecución (carga en frío) y de una re-ejecución de cada página."""
+    from streamlit.testing.v1 import AppTest
+
+    import registro_datos
+
+    directorio = _datos(nombre, lineas)
+    m = Medicion()
+    with servidor_local(directorio) as url, tempfile.TemporaryDirectory() as dir_cache:
+        url_original, cache_original = descargas.URL_BASE, descargas.DIR_CACHE
+        descargas.URL_BASE, descargas.DIR_CACHE = url, dir_cache
+        try:
+            for pagina in ['Ventas', 'Importaciones']:
+                at = AppTest.from_file(APP, default_timeout=3600)
+                at.run()
+                selector = at.sidebar.selectbox[0].select(pagina)
+                # Sin datos en memoria: la primera ejecución paga descarga, parseo y preproceso
+                registro_datos._conjuntos.clear()
+                preprocesamiento._memo = None
+                descargas._frames.clear()
+                for archivo in os.listdir(dir_cache):
+                    os.remove(os.path.join(dir_cache, archivo))
+                with m.etapa(f'pagina_{pagina.lower()}_fria'):
+                    selector.run()
+                with m.etapa(f'pagina_{pagina.lower()}_rerun'):
+                    at.run()
+                if at.exception:
+                    raise RuntimeError(f"La página {pagina} falló: {at.exception[0].value}")
+                preprocesamiento.esperar_snapshots()
+        finally:
+            descargas.URL_BASE, descargas.DIR_CACHE = url_original, cache_original
+    return m.etapas
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=DIR_BENCHMARKS, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def comparar(actual, base):
+    print(f"{'tamaño':<8} {'etapa':<28} {'base (s)':>10} {'actual (s)':>11} {'razón':>7}")
+    for tamano, datos in actual['resultados'].items():
+        etapas_base = base['resultados'].get(tamano, {}).get('etapas', {})
+        for etapa, valores in datos['etapas'].items():
+            if etapa in etapas_base:
+                anterior = etapas_base[etapa]['segundos']
+                razon = valores['segundos'] / anterior if anterior else float('nan')
+                print(f"{tamano:<8} {etapa:<28} {anterior:>10.4f} {valores['segundos']:>11.4f} {razon:>7.2f}")
+        anterior = base['resultados'].get(tamano, {}).get('memoria_ventas_mb')
+        if anterior:
+            actual_mb = datos['memoria_ventas_mb']
+            print(f"{tamano:<8} {'frame de ventas (MB)':<28} {anterior:>10.1f} {actual_mb:>11.1f} {actual_mb / anterior:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanos', nargs='+', default=TAMANOS_POR_DEFECTO,
+                        help=f"tamaños a medir ({', '.join(generar_datos.TAMANOS)} o un número de líneas)")
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto en benchmarks/resultados/)')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior para comparar')
+    parser.add_argument('--apptest', action='store_true', help='medir también las páginas completas con AppTest')
+    args = parser.parse_args()
+
+    commit = _commit()
+    informe = {
+        'commit': commit,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'resultados': {},
+    }
+    for tamano in args.tamanos:
+        lineas = generar_datos.TAMANOS.get(tamano) or int(tamano)
+        print(f"Midiendo {tamano}...")
+        resultado = medir_tamano(tamano, lineas)
+        if args.apptest:
+            resultado['etapas'].update(medir_paginas(tamano, lineas))
+        informe['resultados'][tamano] = resultado
+        for etapa, valores in resultado['etapas'].items():
+            print(f"  {etapa:<28} {valores['segundos']:>10.4f} s  {valores['pico_rss_mb']:>9.1f} MB pico"
+                  f"  {valores['aumento_rss_mb']:>+9.1f} MB")
+        print(f"  {'frame de ventas':<28} {resultado['memoria_ventas_mb']:>22.1f} MB")
+
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(informe, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
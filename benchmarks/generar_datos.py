@@ -0,0 +1,161 @@
+"""Genera datasource.csv, categorias.csv e importaciones.csv sintéticos.
+
+Usan los mismos esquemas y formatos que los archivos reales (montos con coma
+decimal, campos de la orden solo en la primera línea de cada ID). La
+popularidad de los SKU sigue una ley de Zipf y el tamaño de las órdenes una
+distribución de cola larga, como en los datos reales.
+
+Uso: python -m benchmarks.generar_datos DIRECTORIO LINEAS [--seed N]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+TAMANOS = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+CATEGORIAS = {
+    'Crops': ['Crop Pedreria', 'Crop Basico', 'Crop Encaje'],
+    'Faldas': ['Falda Short', 'Falda Larga'],
+    'Pijamas': ['Pijama'],
+    'Poleras': ['Polera Oversize', 'Polera Basica'],
+    'Pantalones': ['Jeans', 'Cargo'],
+}
+COLORES = {'N': 'Negro', 'BL': 'Blanco', 'RJ': 'Rojo', 'AZ': 'Azul', 'BE': 'Beige', 'PL': 'Plateado'}
+REGIONES = ['Metropolitana', 'Valparaíso', "O'Higgins", 'Coquimbo', 'Atacama', 'Maule', 'Biobío', 'Tarapacá',
+            'Antofagasta', 'Araucanía', 'Los Lagos', 'Los Ríos', 'Ñuble', 'Arica y Parinacota', 'Aysén', 'Magallanes']
+PESOS_REGIONES = np.array([40, 8, 6, 6, 4, 5, 7, 3, 4, 4, 4, 2, 2, 2, 1, 2], dtype=float)
+ENVIOS = ['Despacho Santiago (RM) a domicilio', 'Despacho a domicilio con Starken (Regiones) POR PAGAR',
+          'Retiro en sucursal de Starken (Regiones) POR PAGAR', 'Correo Ordinario']
+PAGOS = ['Transferencia Bancaria', 'Paga con Webpay', 'Tarjeta (Webpay Plus)', 'Webpay.cl 2.0']
+ESTADOS = ['Pagado', 'Cancelada', 'Pendiente']
+CUPONES = ['2X2', '2X2,Delivery', 'REMATETOTAL', 'Delivery', 'Lotemisterioso6']
+
+COLUMNAS_DATASOURCE = [
+    'ID', 'Estado del Pago', 'Fecha', 'Moneda', 'SKU del Producto', 'Cantidad de Productos',
+    'Precio del Producto', 'Rentabilidad del producto', 'Margen del producto (%)', 'Descuento del producto',
+    'Región de Envío', 'Nombre del método de envío', 'Cupones', 'Nombre de Pago', 'Rut',
+]
+# Órdenes generadas por bloque al escribir datasource.csv
+ORDENES_POR_BLOQUE = 200_000
+# Las órdenes se reparten en este período, sea cual sea el tamaño
+DIAS = 365
+LINEAS_POR_ORDEN = 3.2
+
+
+def catalogo(n_skus, rng):
+    filas = []
+    subcategorias = [(cat, sub) for cat, subs in CATEGORIAS.items() for sub in subs]
+    for i in range(n_skus):
+        categoria, sub = subcategorias[i % len(subcategorias)]
+        color = list(COLORES)[(i // len(subcategorias)) % len(COLORES)]
+        filas.append((categoria, sub, f"{i:05d}{sub.upper().replace(' ', '_')}_{color}_TU", COLORES[color]))
+    df = pd.DataFrame(filas, columns=['Categoria', 'Sub-Categoria', 'SKU del Producto', 'Color'])
+    df['Precio'] = rng.choice([5990, 9990, 12990, 15000, 16990, 19990, 24990], n_skus)
+    df['Margen'] = np.round(rng.uniform(30, 75, n_skus), 2)
+    return df
+
+
+def _montos(valores):
+    # Formato de los montos del export: "15000,00"
+    return pd.Series(np.round(valores).astype(np.int64)).astype(str) + ',00'
+
+
+def _bloque_ordenes(primer_id, n_ordenes, inicio_minutos, minutos_por_orden, skus, probabilidades, rng):
+    lineas = np.minimum(1 + np.floor(rng.lognormal(0.6, 0.9, n_ordenes)).astype(np.int64), 100)
+    ids = np.repeat(np.arange(primer_id, primer_id + n_ordenes), lineas)
+    n = len(ids)
+    primera = np.r_[True, ids[1:] != ids[:-1]]
+
+    minutos = inicio_minutos + np.cumsum(rng.exponential(minutos_por_orden, n_ordenes))
+    fecha = (pd.Timestamp('2024-07-27') + pd.to_timedelta(np.floor(minutos), unit='min')).strftime('%Y-%m-%d %H:%M')
+
+    sku = rng.choice(len(skus), n, p=probabilidades)
+    cantidad = rng.choice([1, 2, 3, 4], n, p=[0.88, 0.1, 0.015, 0.005])
+    precio = skus['Precio'].to_numpy()[sku]
+    margen = skus['Margen'].to_numpy()[sku]
+    descuento = np.where(rng.random(n) < 0.15, precio * rng.choice([0.1, 0.2, 0.5], n), 0)
+
+    def por_orden(valores):
+        # Los campos de la orden solo vienen en su primera línea
+        return np.where(primera, np.repeat(np.asarray(valores, dtype=object), lineas), None)
+
+    df = pd.DataFrame({
+        'ID': ids,
+        'Estado del Pago': por_orden(rng.choice(ESTADOS, n_ordenes, p=[0.8, 0.15, 0.05])),
+        'Fecha': por_orden(np.asarray(fecha)),
+        'Moneda': por_orden(np.full(n_ordenes, 'CLP')),
+        'SKU del Producto': np.where(rng.random(n) < 0.003, None, skus['SKU del Producto'].to_numpy()[sku]),
+        'Cantidad de Productos': cantidad,
+        'Precio del Producto': _montos(precio),
+        'Rentabilidad del producto': _montos((precio - descuento) * margen / 100),
+        'Margen del producto (%)': margen,
+        'Descuento del producto': _montos(descuento),
+        'Región de Envío': por_orden(rng.choice(REGIONES, n_ordenes, p=PESOS_REGIONES / PESOS_REGIONES.sum())),
+        'Nombre del método de envío': por_orden(rng.choice(ENVIOS, n_ordenes, p=[0.45, 0.3, 0.24, 0.01])),
+        'Cupones': por_orden(np.where(rng.random(n_ordenes) < 0.2, rng.choice(CUPONES, n_ordenes), None)),
+        'Nombre de Pago': por_orden(rng.choice(PAGOS, n_ordenes, p=[0.55, 0.4, 0.03, 0.02])),
+        'Rut': por_orden(rng.integers(10_000_000, 25_000_000, n_ordenes).astype(str)),
+    }, columns=COLUMNAS_DATASOURCE)
+    return df, float(minutos[-1])
+
+
+def importaciones(skus, dias, rng):
+    lotes = []
+    for fecha in pd.date_range('2024-07-01', periods=max(dias // 30, 1), freq='30D'):
+        lote = skus[rng.random(len(skus)) < 0.4]
+        lotes.append(pd.DataFrame({
+            'Fecha_Importacion': fecha.strftime('%Y-%m-%d'),
+            'CATEGORIA': lote['Sub-Categoria'].to_numpy(),
+            'TALLA': 'Tu',
+            'MARCA': 'Diamond',
+            'PRODUCTO': (lote['Sub-Categoria'] + ' Onlygloss').to_numpy(),
+            'SKU del Producto': lote['SKU del Producto'].to_numpy(),
+            'STOCK INICIAL': rng.integers(5, 150, len(lote)),
+            'COLOR': lote['Color'].to_numpy(),
+            'COSTO ORIGINAL POR ARTICULO (CLP)': (lote['Precio'] * 0.3).round().astype(int).to_numpy(),
+            'COSTO TOTAL INCLUYENDO VIAJE (CLP)': None,
+        }))
+    return pd.concat(lotes, ignore_index=True)
+
+
+def generar(directorio, lineas, seed=0):
+    """Escribe los tres CSV en `directorio` con aproximadamente `lineas` líneas de venta."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directorio, exist_ok=True)
+    n_skus = int(min(max(lineas // 50, 200), 5000))
+    skus = catalogo(n_skus, rng)
+    rango = np.arange(1, n_skus + 1)
+    probabilidades = 1 / rango ** 1.1
+    probabilidades /= probabilidades.sum()
+
+    skus[['Categoria', 'Sub-Categoria', 'SKU del Producto']].to_csv(os.path.join(directorio, 'categorias.csv'), index=False)
+
+    ruta = os.path.join(directorio, 'datasource.csv')
+    escritas, primer_id, minutos = 0, 1001, 0.0
+    minutos_por_orden = DIAS * 24 * 60 / max(lineas / LINEAS_POR_ORDEN, 1)
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        while escritas < lineas:
+            n_ordenes = min(ORDENES_POR_BLOQUE, max(int((lineas - escritas) / LINEAS_POR_ORDEN), 1))
+            bloque, minutos = _bloque_ordenes(primer_id, n_ordenes, minutos, minutos_por_orden, skus, probabilidades, rng)
+            bloque = bloque.iloc[:lineas - escritas]
+            bloque.to_csv(f, index=False, header=escritas == 0)
+            escritas += len(bloque)
+            primer_id += n_ordenes
+
+    importaciones(skus, int(minutos // (24 * 60)) + 1, rng).to_csv(os.path.join(directorio, 'importaciones.csv'), index=False)
+    return directorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directorio')
+    parser.add_argument('lineas', help=f"cantidad de líneas o uno de {', '.join(TAMANOS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generar(args.directorio, TAMANOS.get(args.lineas) or int(args.lineas), args.seed)
+
+
+if __name__ == '__main__':
+    main()
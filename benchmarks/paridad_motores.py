@@ -0,0 +1,37 @@
+"""Corre tests/test_motor_ventas.py (paridad de los motores pandas y SQLite) con más datos.
+
+Sin --directorio genera datos sintéticos de --lineas líneas. Termina con el
+código de salida de pytest.
+
+Uso: python -m benchmarks.paridad_motores [--lineas N] [--casos N] [--directorio DIR] [--seed N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import pytest
+
+from benchmarks import generar_datos
+
+PRUEBA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'test_motor_ventas.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lineas', type=int, default=20_000, help='líneas de los datos sintéticos')
+    parser.add_argument('--casos', type=int, default=300)
+    parser.add_argument('--directorio', help='directorio con datasource.csv, categorias.csv e importaciones.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directorio = args.directorio or generar_datos.generar(os.path.join(tmp, 'datos'), args.lineas, args.seed)
+        sys.exit(pytest.main([
+            PRUEBA, '-q', '-p', 'no:cacheprovider',
+            f'--paridad-directorio={directorio}', f'--paridad-casos={args.casos}', f'--paridad-seed={args.seed}',
+        ]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+# Granularidad del cubo: un día y una combinación de valores de los filtros
+DIMENSIONES = ['Dia', 'Categoria', 'SKU del Producto', 'Región de Envío', 'Estado del Pago', 'Nombre de Pago', 'Tipo de Venta']
+# Medidas aditivas: el valor de cualquier selección es la suma de sus celdas
+MEDIDAS = ['Ventas Totales', 'Descuentos', 'Ventas Netas', 'Costo', 'Cantidad']
+
+
+def medidas_por_linea(df):
+    """Medidas aditivas de cada línea de venta, con los mismos nombres que el cubo."""
+    # Las columnas del frame pueden ser angostas (float32, int8): se opera en float64
+    cantidad = df['Cantidad de Productos'].astype('float64')
+    return pd.DataFrame({
+        'Ventas Totales': df['Precio del Producto'].astype('float64') * cantidad,
+        'Descuentos': df['Descuento del producto'].astype('float64'),
+        'Ventas Netas': df['Ventas Netas'].astype('float64'),
+        'Costo': df['Costo del Producto'].astype('float64') * cantidad,
+        'Cantidad': cantidad,
+    }, index=df.index)
+
+
+def _codigos_celda(dimensiones):
+    # Combina los códigos de cada dimensión (NaN incluido) en un único código de celda
+    codigos = np.zeros(len(dimensiones), dtype=np.int64)
+    for col in dimensiones.columns:
+        c, unicos = pd.factorize(dimensiones[col], use_na_sentinel=False)
+        codigos, _ = pd.factorize(codigos * max(len(unicos), 1) + c)
+    return codigos
+
+
+class CuboVentas:
+    """Ventas agregadas por DIMENSIONES con medidas aditivas.
+
+    La cantidad de órdenes distintas no es aditiva, así que cada celda guarda
+    el conjunto de órdenes que contiene (pares celda/orden ordenados por celda);
+    unir esos conjuntos da el conteo exacto para cualquier selección de celdas.
+    """
+
+    def __init__(self, celdas, par_celda, par_orden, ids):
+        self.celdas = celdas
+        self._par_celda = par_celda
+        self._par_orden = par_orden
+        # ID de cada código de orden de los pares
+        self._ids = ids
+        self._n_ordenes = max(len(ids), 1)
+
+    @classmethod
+    def construir(cls, df):
+        dimensiones = pd.DataFrame({'Dia': df['Fecha'].dt.normalize()}, index=df.index)
+        for col in DIMENSIONES[1:]:
+            dimensiones[col] = df[col]
+        celda = _codigos_celda(dimensiones)
+        n_celdas = int(celda.max()) + 1 if len(celda) else 0
+
+        primera = np.unique(celda, return_index=True)[1]
+        celdas = dimensiones.iloc[primera].reset_index(drop=True)
+        # Las celdas guardan los valores como objetos para combinarse con las de otros
+        # frames sin depender de sus categorías (ver actualizar)
+        for col in celdas.select_dtypes('category').columns:
+            celdas[col] = celdas[col].astype(object)
+        medidas = medidas_por_linea(df)
+        for col in MEDIDAS:
+            valores = np.nan_to_num(medidas[col].to_numpy(dtype='float64'))
+            # Sin líneas bincount devuelve enteros
+            celdas[col] = np.bincount(celda, weights=valores, minlength=n_celdas).astype('float64')
+
+        orden, ids = pd.factorize(df['ID'])
+        n_ordenes = max(len(ids), 1)
+        pares = np.unique(celda.astype(np.int64) * n_ordenes + orden)
+        return cls(celdas, pares // n_ordenes, pares % n_ordenes, pd.Index(ids))
+
+    def actualizar(self, quitadas, nuevas):
+        """Cubo con las líneas `quitadas` restadas y las `nuevas` sumadas.
+
+        Solo se recombinan las celdas desde el primer día de esas líneas, así que
+        al anexar ventas recientes el costo depende de las líneas recibidas y no
+        del historial. `quitadas` deben ser todas las líneas de sus órdenes.
+        """
+        resta = CuboVentas.construir(quitadas)
+        suma = CuboVentas.construir(nuevas)
+        dias = pd.concat([resta.celdas['Dia'], suma.celdas['Dia']])
+        afectada = (self.celdas['Dia'] >= dias.min()).to_numpy()
+        if dias.isna().any():
+            afectada |= self.celdas['Dia'].isna().to_numpy()
+
+        # Las celdas no afectadas conservan su orden y van primero
+        n_fijas = int(np.count_nonzero(~afectada))
+        codigo_fija = np.cumsum(~afectada) - 1
+        par_fijo = ~afectada[self._par_celda]
+
+        partes = [self.celdas[afectada], resta.celdas, suma.celdas]
+        dimensiones = pd.concat([c[DIMENSIONES] for c in partes], ignore_index=True)
+        celda = _codigos_celda(dimensiones)
+        n_celdas = int(celda.max()) + 1 if len(celda) else 0
+        codigo_afectada = np.full(len(self.celdas), -1, dtype=np.int64)
+        codigo_afectada[afectada] = celda[:len(partes[0])]
+
+        # Las órdenes existentes conservan su código y las nuevas se agregan al final
+        codigos_suma = self._ids.get_indexer(suma._ids)
+        ids = self._ids.append(suma._ids[codigos_suma < 0])
+        codigos_suma[codigos_suma < 0] = np.arange(len(self._ids), len(ids))
+
+        # Pares de las celdas afectadas sin las órdenes quitadas, más los de las líneas nuevas
+        par_celda = self._par_celda[~par_fijo]
+        par_orden = self._par_orden[~par_fijo]
+        conservar = ~np.isin(par_orden, self._ids.get_indexer(resta._ids))
+        par_celda = np.concatenate([codigo_afectada[par_celda[conservar]], celda[len(partes[0]) + len(partes[1]) + suma._par_celda]])
+        par_orden = np.concatenate([par_orden[conservar], codigos_suma[suma._par_orden]])
+
+        # Las celdas que quedaron sin órdenes solo tenían líneas quitadas
+        vivas = np.unique(par_celda)
+        recodificar = np.full(n_celdas, -1, dtype=np.int64)
+        recodificar[vivas] = n_fijas + np.arange(len(vivas))
+        primera = np.unique(celda, return_index=True)[1]
+        recombinadas = dimensiones.iloc[primera[vivas]].reset_index(drop=True)
+        signo = np.repeat([1.0, -1.0, 1.0], [len(c) for c in partes])
+        for col in MEDIDAS:
+            valores = np.concatenate([c[col].to_numpy() for c in partes]) * signo
+            recombinadas[col] = np.bincount(celda, weights=valores, minlength=n_celdas)[vivas]
+
+        n_ordenes = max(len(ids), 1)
+        pares = np.unique(recodificar[par_celda] * n_ordenes + par_orden)
+        return CuboVentas(
+            pd.concat([self.celdas[~afectada], recombinadas], ignore_index=True),
+            np.concatenate([codigo_fija[self._par_celda[par_fijo]], pares // n_ordenes]),
+            np.concatenate([self._par_orden[par_fijo], pares % n_ordenes]),
+            ids,
+        )
+
+    def seleccionar(self, desde=None, hasta=None, filtros=None):
+        """Máscara de celdas para un rango de días [desde, hasta] y filtros {columna: valores}."""
+        mask = np.ones(len(self.celdas), dtype=bool)
+        if desde is not None:
+            mask &= (self.celdas['Dia'] >= pd.Timestamp(desde)).to_numpy()
+        if hasta is not None:
+            mask &= (self.celdas['Dia'] <= pd.Timestamp(hasta)).to_numpy()
+        for col, valores in (filtros or {}).items():
+            mask &= self.celdas[col].isin(valores).to_numpy()
+        return mask
+
+    def contar_ordenes(self, mask):
+        ordenes = self._par_orden[mask[self._par_celda]]
+        return int(np.count_nonzero(np.bincount(ordenes, minlength=self._n_ordenes)))
+
+    def totales(self, mask):
+        """Suma de las medidas y cantidad de órdenes distintas de las celdas seleccionadas."""
+        seleccion = self.celdas.loc[mask, MEDIDAS]
+        resultado = {col: float(seleccion[col].sum()) for col in MEDIDAS}
+        resultado['Ordenes'] = self.contar_ordenes(mask)
+        return resultado
+
+    def agrupar(self, mask, por, medidas=None):
+        """Medidas de las celdas seleccionadas agrupadas por `por` (sin grupos NaN).
+
+        Además de MEDIDAS se puede pedir 'Ordenes', las órdenes distintas de cada grupo.
+        """
+        medidas = list(medidas or MEDIDAS)
+        grupos = self.celdas.loc[mask].groupby(por, observed=True)
+        resultado = grupos[[col for col in medidas if col != 'Ordenes']].sum()
+        if 'Ordenes' in medidas:
+            # Grupo de cada celda seleccionada (-1 fuera de la selección o en grupos NaN)
+            grupo_celda = np.full(len(self.celdas), -1, dtype=np.int64)
+            grupo_celda[mask] = grupos.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+            grupo = grupo_celda[self._par_celda]
+            dentro = grupo >= 0
+            pares = np.unique(grupo[dentro] * self._n_ordenes + self._par_orden[dentro])
+            resultado['Ordenes'] = np.bincount(pares // self._n_ordenes, minlength=len(resultado))
+        return resultado[medidas]
@@ -0,0 +1,378 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrumentacion
+
+# Origen de los CSV. Se puede apuntar a un servidor local con OG_APP_DATA_URL.
+URL_BASE = os.environ.get(
+    "OG_APP_DATA_URL", "https://raw.githubusercontent.com/HUHU0101123/og-app/main"
+)
+# Copia local de cada archivo descargado junto a su ETag/Last-Modified.
+DIR_CACHE = os.environ.get(
+    "OG_APP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+# Segundos para conectar y para esperar cada lectura del cuerpo
+TIMEOUT_CONEXION = 5
+TIMEOUT = 30
+# Reintentos ante errores de conexión y respuestas 429/5xx, con espera exponencial
+REINTENTOS = 3
+# Descargas simultáneas (y conexiones keep-alive que se mantienen abiertas)
+DESCARGAS_SIMULTANEAS = 4
+# Bytes leídos del cuerpo de la respuesta por vez
+TAMANO_BLOQUE = 1 << 18
+# Bytes del final de la copia local que se vuelven a pedir al descargar solo
+# lo anexado, para comprobar que el archivo remoto no cambió antes del final
+SOLAPE = 256
+
+# Estados posibles de una descarga
+DESCARGADO = "descargado"
+SIN_CAMBIOS = "sin_cambios"
+SIN_CONEXION = "sin_conexion"
+ANEXADO = "anexado"
+
+# ruta -> Future de la descarga en curso, que comparten los pedidos simultáneos del mismo archivo
+_en_curso = {}
+_en_curso_lock = threading.Lock()
+# (nombre, parser) -> (version, frame) para reutilizar el frame cuando el servidor responde 304
+_frames = {}
+_sesion = None
+_sesion_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=DESCARGAS_SIMULTANEAS, thread_name_prefix="descarga")
+
+
+class Descarga:
+    """Copia local de un archivo remoto.
+
+    Con estado ANEXADO, `anterior` es la `Descarga` de la copia previa, que es
+    un prefijo de la actual de `anterior.tamano` bytes. Si se pidió un parser y
+    el archivo se descargó completo, `frame` es el resultado de parsearlo
+    mientras llegaba.
+    """
+
+    def __init__(self, nombre, ruta, version, estado, tamano=None, anterior=None, frame=None):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.version = version
+        self.estado = estado
+        self.tamano = tamano
+        self.anterior = anterior
+        self.frame = frame
+
+    def __repr__(self):
+        return f"Descarga({self.nombre!r}, version={self.version!r}, estado={self.estado!r})"
+
+
+def sesion():
+    """Sesión HTTP compartida: conexiones keep-alive reutilizadas entre descargas y reintentos."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            reintentos = Retry(
+                total=REINTENTOS,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+                # Tras el último reintento se devuelve la respuesta y raise_for_status decide
+                raise_on_status=False,
+            )
+            adaptador = HTTPAdapter(max_retries=reintentos, pool_maxsize=2 * DESCARGAS_SIMULTANEAS)
+            _sesion = requests.Session()
+            _sesion.mount("http://", adaptador)
+            _sesion.mount("https://", adaptador)
+        return _sesion
+
+
+def _get(url, headers):
+    return sesion().get(url, headers=headers, timeout=(TIMEOUT_CONEXION, TIMEOUT), stream=True)
+
+
+def en_paralelo(funcion, *args, **kwargs):
+    """Ejecuta `funcion(*args, **kwargs)` en el pool de descargas y devuelve su Future."""
+    return _pool.submit(instrumentacion.en_ejecucion_actual(funcion), *args, **kwargs)
+
+
+def _compartida(ruta, parser, descargar):
+    # Si el archivo ya se está descargando se espera ese resultado en vez de pedirlo otra vez
+    with _en_curso_lock:
+        futuro = _en_curso.get(ruta)
+        propia = futuro is None
+        if propia:
+            futuro = _en_curso[ruta] = Future()
+    if not propia:
+        instrumentacion.contar("descargas", "compartida")
+        descarga, parser_usado = futuro.result()
+        if parser_usado is not parser and descarga.frame is not None:
+            # El frame se parseó para otro pedido: este lee la copia en disco
+            descarga = Descarga(descarga.nombre, descarga.ruta, descarga.version, descarga.estado,
+                                descarga.tamano, descarga.anterior)
+        return descarga
+    try:
+        descarga = descargar()
+        futuro.set_result((descarga, parser))
+        return descarga
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        with _en_curso_lock:
+            del _en_curso[ruta]
+
+
+def _rutas(nombre, dir_cache):
+    return os.path.join(dir_cache, nombre), os.path.join(dir_cache, nombre + ".json")
+
+
+def _leer_meta(ruta_meta):
+    try:
+        with open(ruta_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _ruta_tmp(ruta):
+    return f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _escribir_atomico(ruta, contenido, modo="wb"):
+    tmp = _ruta_tmp(ruta)
+    with open(tmp, modo) as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+def _url(nombre, url_base):
+    return f"{(url_base or URL_BASE).rstrip('/')}/{nombre}"
+
+
+def _condicionales(meta):
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+class _Cuerpo(io.RawIOBase):
+    """Cuerpo de una respuesta leído a medida que llega y copiado a `archivo`.
+
+    Se puede pasar a un parser como archivo binario: cada bloque que el parser
+    lee queda escrito en disco y sumado al hash.
+    """
+
+    def __init__(self, resp, archivo):
+        self._bloques = resp.iter_content(TAMANO_BLOQUE)
+        self._archivo = archivo
+        self._pendiente = memoryview(b"")
+        self.hash = hashlib.sha256()
+        self.tamano = 0
+
+    def readable(self):
+        return True
+
+    def _siguiente(self):
+        for bloque in self._bloques:
+            if bloque:
+                self._archivo.write(bloque)
+                self.hash.update(bloque)
+                self.tamano += len(bloque)
+                return memoryview(bloque)
+        return None
+
+    def readinto(self, destino):
+        if not self._pendiente:
+            bloque = self._siguiente()
+            if bloque is None:
+                return 0
+            self._pendiente = bloque
+        n = min(len(destino), len(self._pendiente))
+        destino[:n] = self._pendiente[:n]
+        self._pendiente = self._pendiente[n:]
+        return n
+
+    def terminar(self):
+        """Copia lo que el parser no leyó."""
+        while self._siguiente() is not None:
+            pass
+
+
+def _guardar(nombre, ruta, ruta_meta, dir_cache, resp, parser=None):
+    # El cuerpo va directo a disco (y al parser, si hay) sin cargarlo entero en memoria
+    os.makedirs(dir_cache, exist_ok=True)
+    tmp = _ruta_tmp(ruta)
+    frame = None
+    try:
+        with open(tmp, "wb") as f:
+            cuerpo = _Cuerpo(resp, f)
+            if parser is not None:
+                try:
+                    frame = parser(io.BufferedReader(cuerpo, TAMANO_BLOQUE))
+                except requests.RequestException:
+                    raise
+                except Exception:
+                    # Se vuelve a parsear desde la copia en disco, donde el error se informa como siempre
+                    frame = None
+            cuerpo.terminar()
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    meta = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "version": cuerpo.hash.hexdigest()[:16],
+        "tamano": cuerpo.tamano,
+    }
+    _escribir_atomico(ruta_meta, json.dumps(meta), modo="w")
+    return Descarga(nombre, ruta, meta["version"], DESCARGADO, meta["tamano"], frame=frame)
+
+
+def _descargar(nombre, url, ruta, ruta_meta, dir_cache, parser):
+    meta = _leer_meta(ruta_meta) if os.path.exists(ruta) else None
+
+    headers = {"Accept-Encoding": "gzip", **_condicionales(meta or {})}
+    try:
+        # requests descomprime el cuerpo gzip automáticamente
+        with instrumentacion.etapa(f"descarga.{nombre}"), _get(url, headers) as resp:
+            if resp.status_code == 304 and meta:
+                instrumentacion.contar("descargas", "acierto")
+                return Descarga(nombre, ruta, meta["version"], SIN_CAMBIOS, meta.get("tamano"))
+            resp.raise_for_status()
+            descarga = _guardar(nombre, ruta, ruta_meta, dir_cache, resp, parser)
+    except requests.RequestException:
+        if meta:
+            instrumentacion.contar("descargas", "copia_local")
+            return Descarga(nombre, ruta, meta["version"], SIN_CONEXION, meta.get("tamano"))
+        raise
+    instrumentacion.contar("descargas", "fallo")
+    return descarga
+
+
+def descargar(nombre, url_base=None, dir_cache=None, parser=None):
+    """Descarga `nombre` con una petición condicional y devuelve un `Descarga`.
+
+    Si el servidor responde 304, o no responde, se usa la copia en disco. Con
+    `parser`, un archivo descargado completo se parsea mientras llega.
+    """
+    url = _url(nombre, url_base)
+    dir_cache = dir_cache or DIR_CACHE
+    ruta, ruta_meta = _rutas(nombre, dir_cache)
+    return _compartida(ruta, parser, lambda: _descargar(nombre, url, ruta, ruta_meta, dir_cache, parser))
+
+
+def _inicio_rango(resp):
+    # "Content-Range: bytes 1000-1999/2000" -> 1000
+    try:
+        return int(resp.headers["Content-Range"].split()[1].split("-")[0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def _anexar(nombre, ruta, ruta_meta, meta, inicio, resp):
+    # Agrega a la copia los bytes posteriores al solape; None si el solape no coincide
+    tamano = meta["tamano"]
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        solape = f.read()
+    cuerpo = resp.content
+    if _inicio_rango(resp) != inicio or cuerpo[:len(solape)] != solape:
+        return None
+    nuevo = cuerpo[len(solape):]
+    anterior = Descarga(nombre, ruta, meta["version"], SIN_CAMBIOS, tamano)
+    meta = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        # Hash encadenado: no hace falta volver a leer el archivo completo
+        "version": hashlib.sha256(meta["version"].encode() + nuevo).hexdigest()[:16] if nuevo else meta["version"],
+        "tamano": tamano + len(nuevo),
+    }
+    if nuevo:
+        with open(ruta, "r+b") as f:
+            f.seek(tamano)
+            f.write(nuevo)
+            f.truncate()
+    _escribir_atomico(ruta_meta, json.dumps(meta), modo="w")
+    if not nuevo:
+        instrumentacion.contar("descargas", "acierto")
+        return Descarga(nombre, ruta, meta["version"], SIN_CAMBIOS, tamano)
+    instrumentacion.contar("descargas", "anexado")
+    return Descarga(nombre, ruta, meta["version"], ANEXADO, meta["tamano"], anterior)
+
+
+def _descargar_anexado(nombre, url, ruta, ruta_meta, dir_cache, parser):
+    meta = _leer_meta(ruta_meta) if os.path.exists(ruta) else None
+    # Sin tamaño registrado (o si no coincide con el disco) la copia no sirve de prefijo
+    if meta and meta.get("tamano") == os.path.getsize(ruta):
+        tamano = meta["tamano"]
+        inicio = max(tamano - SOLAPE, 0)
+        # Los rangos se aplican sobre el cuerpo sin comprimir
+        headers = {"Accept-Encoding": "identity", "Range": f"bytes={inicio}-", **_condicionales(meta)}
+        try:
+            with instrumentacion.etapa(f"descarga.{nombre}"), _get(url, headers) as resp:
+                if resp.status_code == 304:
+                    instrumentacion.contar("descargas", "acierto")
+                    return Descarga(nombre, ruta, meta["version"], SIN_CAMBIOS, tamano)
+                if resp.status_code == 200:
+                    # El servidor ignoró el rango y envió el archivo completo
+                    descarga = _guardar(nombre, ruta, ruta_meta, dir_cache, resp, parser)
+                    instrumentacion.contar("descargas", "fallo")
+                    return descarga
+                if resp.status_code == 206:
+                    descarga = _anexar(nombre, ruta, ruta_meta, meta, inicio, resp)
+                    if descarga is not None:
+                        return descarga
+                # 416: el archivo remoto es más corto que la copia, se descarga completo
+                elif resp.status_code != 416:
+                    resp.raise_for_status()
+        except requests.RequestException:
+            instrumentacion.contar("descargas", "copia_local")
+            return Descarga(nombre, ruta, meta["version"], SIN_CONEXION, tamano)
+
+    # No hay copia que extender o el archivo no solo creció
+    return _descargar(nombre, url, ruta, ruta_meta, dir_cache, parser)
+
+
+def descargar_anexado(nombre, url_base=None, dir_cache=None, parser=None):
+    """Como `descargar`, pero para archivos que solo crecen: pide únicamente los bytes nuevos.
+
+    Con una petición Range desde el final de la copia local, los bytes nuevos se
+    agregan al archivo en disco y se devuelve un `Descarga` ANEXADO. Si no hay
+    copia, el servidor no acepta rangos o el archivo cambió antes del final, se
+    descarga completo (parseándolo con `parser`, si se indica).
+    """
+    url = _url(nombre, url_base)
+    dir_cache = dir_cache or DIR_CACHE
+    ruta, ruta_meta = _rutas(nombre, dir_cache)
+    return _compartida(ruta, parser, lambda: _descargar_anexado(nombre, url, ruta, ruta_meta, dir_cache, parser))
+
+
+def cargar_csv(nombre, parser=pd.read_csv, url_base=None, dir_cache=None):
+    """Devuelve (version, frame) del CSV `nombre`, reutilizando el frame si no cambió.
+
+    El frame devuelto es compartido entre llamadas: no debe modificarse.
+    """
+    descarga = descargar(nombre, url_base=url_base, dir_cache=dir_cache, parser=parser)
+    clave = (descarga.ruta, parser)
+    guardado = _frames.get(clave)
+    if guardado is not None and guardado[0] == descarga.version:
+        instrumentacion.contar("csv", "acierto")
+        return guardado
+    instrumentacion.contar("csv", "fallo")
+    if descarga.frame is not None:
+        # Ya se parseó durante la descarga
+        _frames[clave] = (descarga.version, descarga.frame)
+    else:
+        with instrumentacion.etapa(f"parseo.{nombre}"):
+            _frames[clave] = (descarga.version, parser(descarga.ruta))
+    return _frames[clave]
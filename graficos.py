@@ -0,0 +1,104 @@
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def figura_importaciones(importaciones_agrupadas, fecha_seleccionada):
+    """Barras horizontales de importaciones por categoría en una sola traza.
+
+    La línea roja de 'Cantidad Vendida' de cada categoría se dibuja con shapes
+    del layout en vez de una traza por categoría. Sin las columnas 'vendida'
+    y 'porcentaje' (venta_lotes.por_categoria) la línea queda en 0.
+    """
+    categorias = importaciones_agrupadas['Categoria'].astype(str).tolist()
+    cantidades = importaciones_agrupadas['cantidad'].tolist()
+    if 'vendida' in importaciones_agrupadas.columns:
+        vendidas = importaciones_agrupadas['vendida'].tolist()
+        porcentajes = importaciones_agrupadas['porcentaje'].tolist()
+    else:
+        vendidas = porcentajes = [0] * len(categorias)
+    colores = px.colors.qualitative.Plotly
+
+    fig = go.Figure(go.Bar(
+        x=cantidades,
+        y=categorias,
+        orientation='h',
+        marker_color=[colores[i % len(colores)] for i in range(len(categorias))],
+        hoverinfo='skip',  # Desactiva las tooltips para las barras
+        text=cantidades,  # Muestra la cantidad al final de la barra
+        textposition='outside',  # Posiciona el texto al final de la barra
+        showlegend=False
+    ))
+
+    # Línea de 'cantidad vendida' de cada categoría, con el % vendido del stock importado
+    shapes = [
+        dict(type='line', xref='x', yref='y', x0=vendida, x1=vendida, y0=i - 0.4, y1=i + 0.4,
+             line=dict(color='red', dash='dash'))
+        for i, vendida in enumerate(vendidas)
+    ]
+    etiquetas = [
+        dict(x=vendida, y=categoria, xref='x', yref='y', text=f"{porcentaje:.0f}%", showarrow=False,
+             xanchor='left', yanchor='bottom', font=dict(color='red'))
+        for categoria, vendida, porcentaje in zip(categorias, vendidas, porcentajes)
+    ]
+
+    fig.update_layout(
+        title=f"Importaciones por Categoría para la Fecha: {fecha_seleccionada}",
+        xaxis_title="Cantidad de Prendas",
+        yaxis_title="Categoría",
+        yaxis=dict(type='category', categoryorder='array', categoryarray=categorias),
+        xaxis=dict(
+            range=[-10, max(cantidades + vendidas, default=0) * 1.1]
+        ),
+        shapes=shapes,
+        annotations=etiquetas + [
+            dict(
+                x=0,
+                y=-0.5,  # Position annotation below the chart
+                xref='x',
+                yref='paper',
+                text="La línea roja representa la 'Cantidad Vendida' de cada categoría y su % del stock importado.",
+                showarrow=False,
+                font=dict(size=12, color="black"),
+                align="center",
+                bgcolor="rgba(255, 255, 255, 0.7)"
+            )
+        ]
+    )
+    return fig
+
+
+def figura_ventas_sku(ventas_sku):
+    """Barras apiladas de ventas netas por categoría y SKU, con una traza por SKU.
+
+    `ventas_sku` tiene una fila por (Categoria, SKU del Producto) con
+    Ventas_Netas y Cantidad_Productos. Equivale a px.bar con color por SKU (la
+    leyenda distingue los SKUs y permite ocultarlos), pero las trazas se arman
+    como dicts y sin validarlas una por una: con miles de SKUs px.bar tarda
+    varias veces más. Aun así el costo crece con la cantidad de SKUs.
+    """
+    skus = ventas_sku['SKU del Producto'].astype(str)
+    categorias = ventas_sku['Categoria'].astype(str).to_numpy()
+    ventas = ventas_sku['Ventas_Netas'].to_numpy()
+    cantidades = ventas_sku['Cantidad_Productos'].to_numpy()
+    colores = px.colors.qualitative.Plotly
+    hover = (
+        "Categoria=%{x}<br>Ventas Netas=%{y}<br>"
+        "SKU del Producto=%{fullData.name}<br>Cantidad_Productos=%{customdata}<extra></extra>"
+    )
+
+    # Una traza por SKU, en orden de aparición y con los colores de px.bar
+    trazas = [
+        dict(
+            type='bar', x=categorias[filas], y=ventas[filas], customdata=cantidades[filas], name=sku,
+            legendgroup=sku, marker=dict(color=colores[i % len(colores)]), hovertemplate=hover,
+        )
+        for i, (sku, filas) in enumerate(skus.groupby(skus, sort=False).indices.items())
+    ]
+    layout = dict(
+        title=dict(text="Ventas Netas por Categoría y SKU"),
+        xaxis=dict(title=dict(text="Categoria")),
+        yaxis=dict(title=dict(text="Ventas Netas")),
+        legend=dict(title=dict(text="SKU del Producto"), tracegroupgap=0),
+        barmode='relative',
+    )
+    return go.Figure(data=trazas, layout=layout, _validate=False)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+class _ListasPosiciones:
+    """Posiciones (ordenadas) de las filas con cada valor de una columna."""
+
+    def __init__(self, valores):
+        codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+        self._armar(pd.Index(unicos), codigos, np.arange(len(codigos)))
+
+    def _armar(self, valores, codigos, posiciones):
+        self.valores = valores
+        self.posiciones = posiciones[np.argsort(codigos, kind='stable')]
+        self.limites = np.concatenate([[0], np.cumsum(np.bincount(codigos, minlength=len(valores)))])
+
+    def anexar(self, desde, valores):
+        """Listas sin las posiciones >= `desde` y con `valores` en las posiciones desde, desde+1, ..."""
+        codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+        codigo_unico = self.valores.get_indexer(pd.Index(unicos))
+        nuevos = codigo_unico < 0
+        codigo_unico[nuevos] = np.arange(len(self.valores), len(self.valores) + int(nuevos.sum()))
+        conservar = self.posiciones < desde
+        codigos_actuales = np.repeat(np.arange(len(self.valores)), np.diff(self.limites))
+        listas = object.__new__(_ListasPosiciones)
+        # El orden estable deja cada lista ordenada: las posiciones nuevas van después de las conservadas
+        listas._armar(
+            self.valores.append(pd.Index(unicos)[nuevos]),
+            np.concatenate([codigos_actuales[conservar], codigo_unico[codigos]]),
+            np.concatenate([self.posiciones[conservar], np.arange(desde, desde + len(valores))]),
+        )
+        return listas
+
+    def union(self, seleccion, lo, hi):
+        """Posiciones en [lo, hi) cuyo valor está en `seleccion`."""
+        partes = []
+        for k in np.unique(self.valores.get_indexer(pd.Index(seleccion))):
+            if k < 0:
+                continue
+            lista = self.posiciones[self.limites[k]:self.limites[k + 1]]
+            partes.append(lista[np.searchsorted(lista, lo):np.searchsorted(lista, hi)])
+        if not partes:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(partes))
+
+
+class IndiceFiltros:
+    """Índice de los filtros de la barra lateral de Ventas.
+
+    Las filas se ordenan por Fecha, de modo que un rango de fechas es un corte
+    por búsqueda binaria; cada columna filtrable guarda la lista de posiciones
+    de cada valor y los filtros de selección múltiple se resuelven uniendo e
+    intersectando esas listas. El costo depende del tamaño del resultado.
+    """
+
+    def __init__(self, df, columnas):
+        fechas = df['Fecha'].to_numpy()
+        self._orden = np.argsort(fechas, kind='stable')  # NaT queda al final
+        self._fechas = fechas[self._orden][:int((~pd.isna(fechas)).sum())]
+        # Si los datos ya vienen en orden cronológico no hace falta reordenar el resultado
+        self._cronologico = bool(np.all(np.diff(self._orden) > 0))
+        self._listas = {col: _ListasPosiciones(df[col].to_numpy()[self._orden]) for col in columnas}
+
+    def anexar(self, df, desde):
+        """Índice de `df`, cuyas primeras `desde` filas son las mismas que las del índice actual.
+
+        Solo se extiende el índice si las filas estaban en orden cronológico y las
+        nuevas lo continúan; si no, devuelve None y hay que construirlo de nuevo.
+        """
+        fechas = df['Fecha'].to_numpy()[desde:]
+        if (
+            not self._cronologico
+            or len(self._fechas) < desde
+            or pd.isna(fechas).any()
+            or np.any(np.diff(fechas) < np.timedelta64(0))
+            or (desde > 0 and len(fechas) and fechas[0] < self._fechas[desde - 1])
+        ):
+            return None
+        indice = object.__new__(IndiceFiltros)
+        indice._orden = np.arange(len(df))
+        indice._fechas = np.concatenate([self._fechas[:desde], fechas])
+        indice._cronologico = True
+        indice._listas = {col: lista.anexar(desde, df[col].to_numpy()[desde:]) for col, lista in self._listas.items()}
+        return indice
+
+    def seleccionar(self, desde, hasta, filtros=None):
+        """Posiciones de las filas (en el orden original) con Fecha en [desde, hasta] y los filtros {columna: valores}.
+
+        Cada filtro recibido se aplica; una lista vacía no deja pasar ninguna fila.
+        """
+        lo = int(np.searchsorted(self._fechas, np.datetime64(pd.Timestamp(desde)), side='left'))
+        hi = int(np.searchsorted(self._fechas, np.datetime64(pd.Timestamp(hasta)), side='right'))
+
+        candidatos = [self._listas[col].union(valores, lo, hi) for col, valores in (filtros or {}).items()]
+        if candidatos:
+            candidatos.sort(key=len)
+            posiciones = candidatos[0]
+            for otras in candidatos[1:]:
+                posiciones = np.intersect1d(posiciones, otras, assume_unique=True)
+        else:
+            posiciones = np.arange(lo, hi)
+        filas = self._orden[posiciones]
+        return filas if self._cronologico else np.sort(filas)
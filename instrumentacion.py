@@ -0,0 +1,174 @@
+"""Temporizadores por etapa, contadores de caché y perfiles de cProfile.
+
+Las mediciones son globales del proceso y se guardan en ventanas móviles
+para calcular percentiles de latencia por etapa.
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import platform
+import pstats
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Mediciones guardadas por etapa para los percentiles
+VENTANA = 500
+PERCENTILES = (50, 90, 99)
+
+_lock = threading.Lock()
+_duraciones = defaultdict(lambda: deque(maxlen=VENTANA))
+# Cantidad y suma de segundos acumuladas por etapa desde el inicio (o el último reinicio)
+_totales = defaultdict(lambda: [0, 0.0])
+_contadores = Counter()
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def etapa(nombre):
+    """Mide la duración del bloque y la registra bajo `nombre`."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        with _lock:
+            _duraciones[nombre].append(duracion)
+            total = _totales[nombre]
+            total[0] += 1
+            total[1] += duracion
+        ultima = getattr(_local, "ejecucion", None)
+        if ultima is not None:
+            ultima[nombre] = ultima.get(nombre, 0.0) + duracion
+
+
+def contar(cache, resultado):
+    """Suma uno al contador de `cache` para `resultado` ('acierto', 'fallo', ...)."""
+    with _lock:
+        _contadores[(cache, resultado)] += 1
+
+
+@contextlib.contextmanager
+def ejecucion(perfilar=False):
+    """Agrupa las etapas de una re-ejecución de la página y opcionalmente la perfila.
+
+    Entrega un dict que al salir contiene 'etapas' (segundos por etapa) y,
+    si se pidió, 'perfil' con el resumen de cProfile.
+    """
+    resultado = {"etapas": {}}
+    _local.ejecucion = resultado["etapas"]
+    perfil = cProfile.Profile() if perfilar else None
+    if perfil is not None:
+        perfil.enable()
+    try:
+        yield resultado
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            salida = io.StringIO()
+            pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(40)
+            resultado["perfil"] = salida.getvalue()
+        _local.ejecucion = None
+
+
+def en_ejecucion_actual(funcion):
+    """Envuelve `funcion` para que, al correr en otro hilo, sus etapas cuenten en la re-ejecución actual."""
+    ultima = getattr(_local, "ejecucion", None)
+
+    @functools.wraps(funcion)
+    def envuelta(*args, **kwargs):
+        anterior = getattr(_local, "ejecucion", None)
+        _local.ejecucion = ultima
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            _local.ejecucion = anterior
+
+    return envuelta
+
+
+def memoria_proceso():
+    """Memoria residente (RSS) actual del proceso en bytes.
+
+    Si no se puede leer la actual se devuelve la máxima, y None si tampoco.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return None
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if platform.system() == "Darwin" else pico * 1024
+
+
+def resumen():
+    """Percentiles de latencia por etapa, contadores de caché y memoria del proceso."""
+    with _lock:
+        duraciones = {nombre: np.array(valores) for nombre, valores in _duraciones.items() if valores}
+        totales = {nombre: tuple(total) for nombre, total in _totales.items()}
+        contadores = dict(_contadores)
+    etapas = {}
+    for nombre, valores in sorted(duraciones.items()):
+        etapas[nombre] = {"n": int(len(valores))}
+        for p, valor in zip(PERCENTILES, np.percentile(valores, PERCENTILES)):
+            etapas[nombre][f"p{p}"] = float(valor)
+        etapas[nombre]["total"], etapas[nombre]["suma"] = totales[nombre]
+    caches = defaultdict(dict)
+    for (cache, resultado), n in sorted(contadores.items()):
+        caches[cache][resultado] = n
+    return {"etapas": etapas, "caches": dict(caches), "memoria_bytes": memoria_proceso()}
+
+
+def exportar_json():
+    return json.dumps(resumen(), indent=2, ensure_ascii=False)
+
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def exportar_prometheus():
+    """Resumen en el formato de texto de Prometheus."""
+    datos = resumen()
+    lineas = [
+        "# HELP og_app_etapa_segundos Latencia por etapa (cuantiles de la ventana móvil; _count y _sum acumulados).",
+        "# TYPE og_app_etapa_segundos summary",
+    ]
+    for nombre, valores in datos["etapas"].items():
+        for p in PERCENTILES:
+            lineas.append(f'og_app_etapa_segundos{{etapa="{_etiqueta(nombre)}",quantile="{p / 100}"}} {valores[f"p{p}"]:.6f}')
+        lineas.append(f'og_app_etapa_segundos_sum{{etapa="{_etiqueta(nombre)}"}} {valores["suma"]:.6f}')
+        lineas.append(f'og_app_etapa_segundos_count{{etapa="{_etiqueta(nombre)}"}} {valores["total"]}')
+    lineas += [
+        "# HELP og_app_cache_total Resultados de las cachés de carga.",
+        "# TYPE og_app_cache_total counter",
+    ]
+    for cache, resultados in datos["caches"].items():
+        for resultado, n in resultados.items():
+            lineas.append(f'og_app_cache_total{{cache="{_etiqueta(cache)}",resultado="{_etiqueta(resultado)}"}} {n}')
+    if datos["memoria_bytes"] is not None:
+        lineas += [
+            "# HELP og_app_memoria_bytes Memoria residente del proceso.",
+            "# TYPE og_app_memoria_bytes gauge",
+            f"og_app_memoria_bytes {datos['memoria_bytes']}",
+        ]
+    return "\n".join(lineas) + "\n"
+
+
+def reiniciar():
+    with _lock:
+        _duraciones.clear()
+        _totales.clear()
+        _contadores.clear()
@@ -0,0 +1,74 @@
+"""KPIs de la página de Ventas, sin dependencias de Streamlit.
+
+Todos los KPIs se derivan de las medidas aditivas del cubo y de la cantidad
+de órdenes distintas. Las fórmulas operan sobre columnas, así que la misma
+pasada sirve para una selección (un dict de totales) o para muchos segmentos
+a la vez (un DataFrame con una fila por segmento, como el de `agrupar`).
+"""
+import numpy as np
+import pandas as pd
+
+import cubo_ventas
+
+# Impuesto (IVA) que se descuenta de las ventas netas y de la ganancia bruta
+IMPUESTO = 0.19
+# Medidas de las que salen los KPIs
+MEDIDAS = cubo_ventas.MEDIDAS + ['Ordenes']
+KPIS = [
+    'Ventas Totales', 'Descuentos', 'Ventas Netas', 'Ventas Netas Después de Impuestos', 'Ordenes',
+    'Costo', 'Ganancia Bruta', 'Ganancia Neta', 'Margen', 'Cantidad', 'Descuento Promedio',
+]
+
+
+def _porcentaje(parte, total):
+    # 0 cuando el total no es positivo
+    return np.divide(parte, total, out=np.zeros(len(total)), where=total > 0) * 100
+
+
+def calcular(medidas):
+    """KPIS a partir de MEDIDAS.
+
+    Con un dict (los totales de una selección) devuelve un dict; con un
+    DataFrame (una fila por segmento) devuelve un DataFrame con el mismo índice.
+    """
+    tabla = pd.DataFrame([medidas]) if isinstance(medidas, dict) else medidas
+    ventas_totales = tabla['Ventas Totales'].to_numpy(dtype='float64')
+    ventas_netas = tabla['Ventas Netas'].to_numpy(dtype='float64')
+    costo = tabla['Costo'].to_numpy(dtype='float64')
+    descuentos = tabla['Descuentos'].to_numpy(dtype='float64')
+    ganancia_bruta = ventas_netas - costo
+    resultado = pd.DataFrame({
+        'Ventas Totales': ventas_totales,
+        'Descuentos': descuentos,
+        'Ventas Netas': ventas_netas,
+        'Ventas Netas Después de Impuestos': ventas_netas * (1 - IMPUESTO),
+        'Ordenes': tabla['Ordenes'].to_numpy(dtype='int64'),
+        'Costo': costo,
+        'Ganancia Bruta': ganancia_bruta,
+        'Ganancia Neta': ganancia_bruta * (1 - IMPUESTO),
+        'Margen': _porcentaje(ganancia_bruta, ventas_netas),
+        'Cantidad': tabla['Cantidad'].to_numpy(dtype='float64'),
+        'Descuento Promedio': _porcentaje(descuentos, ventas_totales),
+    }, index=tabla.index)
+    if isinstance(medidas, dict):
+        return {col: resultado[col].iloc[0].item() for col in KPIS}
+    return resultado
+
+
+def por_segmento(motor, seleccion, por):
+    """KPIS de cada valor de `por` dentro de la selección, con una sola consulta al motor."""
+    return calcular(motor.agrupar(seleccion, por, MEDIDAS))
+
+
+def de_lineas(df, por=None):
+    """KPIS calculados directamente de las líneas de venta `df`, en total o por `por`."""
+    medidas = cubo_ventas.medidas_por_linea(df)
+    if por is None:
+        totales = {col: float(medidas[col].sum()) for col in cubo_ventas.MEDIDAS}
+        totales['Ordenes'] = int(df['ID'].nunique())
+        return calcular(totales)
+    claves = [por] if isinstance(por, str) else list(por)
+    grupos = medidas.assign(**{col: df[col] for col in claves + ['ID']}).groupby(por, observed=True)
+    tabla = grupos[cubo_ventas.MEDIDAS].sum()
+    tabla['Ordenes'] = grupos['ID'].nunique()
+    return calcular(tabla)
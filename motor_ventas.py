@@ -0,0 +1,295 @@
+"""Motores de consulta de la página de Ventas.
+
+MotorPandas responde con el cubo y el índice de filtros en memoria. MotorSQLite
+carga ventas, categorías e importaciones en una base SQLite local con índices y
+envía los filtros y agregaciones como SQL, así que a Python solo vuelven los
+resultados. OG_APP_MOTOR elige el motor ("pandas" o "sqlite").
+"""
+import glob
+import os
+import sqlite3
+import threading
+import weakref
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import cubo_ventas
+
+MOTORES = ("pandas", "sqlite")
+MOTOR = os.environ.get("OG_APP_MOTOR", "pandas")
+if MOTOR not in MOTORES:
+    raise ValueError(f"OG_APP_MOTOR debe ser uno de {MOTORES}, no {MOTOR!r}")
+
+# Cambiar cuando cambie el esquema de la base para no reutilizar archivos viejos
+VERSION_ESQUEMA = "1"
+# Columnas de la tabla ventas de SQLite que se pueden filtrar o agrupar. Fecha y
+# Dia se guardan como segundos y días desde 1970 para comparar enteros.
+COLUMNAS_SQL = ['ID', 'Fecha'] + cubo_ventas.DIMENSIONES
+# Solo se indexan las columnas selectivas: las demás filtran pocas filas dentro del rango de fechas
+COLUMNAS_INDEXADAS = ['Fecha', 'ID', 'SKU del Producto']
+
+# Motores SQLite vivos por base. Las sesiones abiertas (y sus fragmentos) siguen usando el
+# motor anterior después de un refresco, así que una base reemplazada se borra recién
+# cuando se libera el último motor que la usa
+_en_uso = Counter()
+_obsoletas = set()
+_lock_bases = threading.Lock()
+
+
+class Seleccion:
+    """Líneas de venta con Fecha en [desde, hasta] y los filtros {columna: valores}.
+
+    Cada filtro recibido se aplica; una lista vacía no deja pasar ninguna línea.
+    El cubo de MotorPandas responde por día, así que el rango debe cubrir días
+    completos (desde a las 00:00 y hasta a las 23:59:59), como lo arma la página.
+    """
+
+    def __init__(self, desde, hasta, filtros=None):
+        self.desde = pd.Timestamp(desde)
+        self.hasta = pd.Timestamp(hasta)
+        self.filtros = dict(filtros or {})
+
+
+class FilasSeleccion:
+    """Posiciones de las líneas de `seleccion`, que se piden a `motor` recién cuando hacen falta."""
+
+    def __init__(self, motor, seleccion):
+        self.motor = motor
+        self.seleccion = seleccion
+
+    def contar(self):
+        return self.motor.contar(self.seleccion)
+
+    def pagina(self, inicio, n):
+        return self.motor.pagina(self.seleccion, inicio, n)
+
+    def todas(self):
+        return self.motor.filas(self.seleccion)
+
+
+class MotorPandas:
+    def __init__(self, df, cubo, indice):
+        self.df = df
+        self.cubo = cubo
+        self.indice = indice
+
+    def seleccionar(self, desde, hasta, filtros=None):
+        return Seleccion(desde, hasta, filtros)
+
+    def filas(self, seleccion):
+        """Posiciones (ordenadas) de las líneas seleccionadas en el frame de ventas."""
+        if not hasattr(seleccion, '_filas'):
+            seleccion._filas = self.indice.seleccionar(seleccion.desde, seleccion.hasta, seleccion.filtros)
+        return seleccion._filas
+
+    def contar(self, seleccion):
+        return len(self.filas(seleccion))
+
+    def pagina(self, seleccion, inicio, n):
+        """Posiciones de las líneas seleccionadas `inicio` a `inicio + n`, en el orden de `filas`."""
+        return self.filas(seleccion)[inicio:inicio + n]
+
+    def _celdas(self, seleccion):
+        # El ID de orden no es una dimensión del cubo: en ese caso se arma un cubo con las filas filtradas
+        if not hasattr(seleccion, '_celdas'):
+            if 'ID' in seleccion.filtros:
+                cubo = cubo_ventas.CuboVentas.construir(self.df.iloc[self.filas(seleccion)])
+                seleccion._celdas = cubo, cubo.seleccionar()
+            else:
+                mask = self.cubo.seleccionar(seleccion.desde.normalize(), seleccion.hasta.normalize(), seleccion.filtros)
+                seleccion._celdas = self.cubo, mask
+        return seleccion._celdas
+
+    def totales(self, seleccion):
+        cubo, mask = self._celdas(seleccion)
+        return cubo.totales(mask)
+
+    def agrupar(self, seleccion, por, medidas=None):
+        cubo, mask = self._celdas(seleccion)
+        return cubo.agrupar(mask, por, medidas)
+
+
+def _columna(nombre):
+    if nombre not in COLUMNAS_SQL:
+        raise KeyError(nombre)
+    return '"' + nombre + '"'
+
+
+def _parametro(valor):
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def _segundos(fecha):
+    return pd.Timestamp(fecha).value // 10**9
+
+
+def _tabla_ventas(df):
+    medidas = cubo_ventas.medidas_por_linea(df)
+    # NaT queda como NaN, que SQLite guarda como NULL
+    segundos = np.where(df['Fecha'].isna(), np.nan, df['Fecha'].to_numpy(dtype='datetime64[s]').astype('int64'))
+    tabla = pd.DataFrame({
+        'fila': np.arange(len(df)),
+        'ID': df['ID'].to_numpy(),
+        'Fecha': segundos,
+        'Dia': np.floor(segundos / 86400),
+    })
+    for col in cubo_ventas.DIMENSIONES[1:]:
+        tabla[col] = df[col].to_numpy()
+    for col in cubo_ventas.MEDIDAS:
+        tabla[col] = medidas[col].fillna(0).to_numpy(dtype='float64')
+    return tabla
+
+
+def construir_base(ruta, ventas, categorias, importaciones):
+    """Escribe la base SQLite en `ruta` (se reemplaza al final, de forma atómica)."""
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        tabla = _tabla_ventas(ventas)
+        columnas = ', '.join(
+            ['fila INTEGER PRIMARY KEY', '"ID" INTEGER', '"Fecha" INTEGER', '"Dia" INTEGER']
+            + [f'"{col}" TEXT' for col in cubo_ventas.DIMENSIONES[1:]]
+            + [f'"{col}" REAL' for col in cubo_ventas.MEDIDAS]
+        )
+        con.execute(f"CREATE TABLE ventas ({columnas})")
+        filas = zip(*[tabla[col].tolist() for col in tabla.columns])
+        con.executemany(f"INSERT INTO ventas VALUES ({', '.join('?' * tabla.shape[1])})", filas)
+        for col in COLUMNAS_INDEXADAS:
+            con.execute(f'CREATE INDEX "ventas_{col}" ON ventas ({_columna(col)})')
+
+        categorias.to_sql('categorias', con, index=False)
+        con.execute('CREATE INDEX categorias_sku ON categorias ("SKU del Producto")')
+        importaciones.to_sql('importaciones', con, index=False)
+        con.execute('CREATE INDEX importaciones_fecha ON importaciones ("Fecha_Importacion")')
+        con.execute('CREATE INDEX importaciones_sku ON importaciones ("SKU del Producto")')
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, ruta)
+
+
+def _borrar_base(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _liberar(ruta):
+    with _lock_bases:
+        _en_uso[ruta] -= 1
+        if _en_uso[ruta] > 0:
+            return
+        del _en_uso[ruta]
+        borrar = ruta in _obsoletas
+        _obsoletas.discard(ruta)
+    if borrar:
+        _borrar_base(ruta)
+
+
+class MotorSQLite:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        # Una conexión de solo lectura por hilo (cada sesión de Streamlit corre en su hilo)
+        self._local = threading.local()
+        with _lock_bases:
+            _en_uso[ruta] += 1
+        weakref.finalize(self, _liberar, ruta)
+
+    @classmethod
+    def abrir(cls, ventas, categorias, importaciones, dir_cache, version):
+        """Motor sobre la base de `version` en `dir_cache`, construyéndola si no existe.
+
+        Al construir una base nueva se borran las anteriores; las que todavía usa
+        algún motor se borran cuando se libera el último.
+        """
+        ruta = os.path.join(dir_cache, f"ventas-{version}-e{VERSION_ESQUEMA}.sqlite")
+        if not os.path.exists(ruta):
+            os.makedirs(dir_cache, exist_ok=True)
+            construir_base(ruta, ventas, categorias, importaciones)
+            with _lock_bases:
+                viejas = [vieja for vieja in glob.glob(os.path.join(dir_cache, "ventas-*.sqlite")) if vieja != ruta]
+                _obsoletas.update(vieja for vieja in viejas if _en_uso[vieja])
+                libres = [vieja for vieja in viejas if vieja not in _obsoletas]
+            for vieja in libres:
+                _borrar_base(vieja)
+        return cls(ruta)
+
+    def _conexion(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True)
+        return con
+
+    def _consulta(self, sql, params):
+        return pd.read_sql_query(sql, self._conexion(), params=params)
+
+    def _where(self, seleccion, no_nulas=()):
+        condiciones = ['"Fecha" >= ?', '"Fecha" <= ?']
+        params = [_segundos(seleccion.desde), _segundos(seleccion.hasta)]
+        for col, valores in seleccion.filtros.items():
+            valores = list(valores)
+            conocidos = [_parametro(v) for v in valores if not pd.isna(v)]
+            partes = []
+            if conocidos:
+                partes.append(f"{_columna(col)} IN ({', '.join('?' * len(conocidos))})")
+                params += conocidos
+            if len(conocidos) < len(valores):
+                partes.append(f"{_columna(col)} IS NULL")
+            condiciones.append(f"({' OR '.join(partes)})" if partes else "0")
+        condiciones += [f"{_columna(col)} IS NOT NULL" for col in no_nulas]
+        return ' AND '.join(condiciones), params
+
+    def seleccionar(self, desde, hasta, filtros=None):
+        return Seleccion(desde, hasta, filtros)
+
+    def filas(self, seleccion):
+        """Posiciones (ordenadas) de las líneas seleccionadas en el frame de ventas."""
+        where, params = self._where(seleccion)
+        filas = self._conexion().execute(f"SELECT fila FROM ventas WHERE {where} ORDER BY fila", params).fetchall()
+        return np.fromiter((fila for fila, in filas), dtype=np.intp, count=len(filas))
+
+    def contar(self, seleccion):
+        where, params = self._where(seleccion)
+        return self._conexion().execute(f"SELECT COUNT(*) FROM ventas WHERE {where}", params).fetchone()[0]
+
+    def pagina(self, seleccion, inicio, n):
+        """Posiciones de las líneas seleccionadas `inicio` a `inicio + n`, en el orden de `filas`."""
+        where, params = self._where(seleccion)
+        filas = self._conexion().execute(
+            f"SELECT fila FROM ventas WHERE {where} ORDER BY fila LIMIT ? OFFSET ?", params + [n, inicio]
+        ).fetchall()
+        return np.fromiter((fila for fila, in filas), dtype=np.intp, count=len(filas))
+
+    def totales(self, seleccion):
+        where, params = self._where(seleccion)
+        medidas = ', '.join(f'TOTAL("{col}")' for col in cubo_ventas.MEDIDAS)
+        fila = self._conexion().execute(f'SELECT {medidas}, COUNT(DISTINCT "ID") FROM ventas WHERE {where}', params).fetchone()
+        resultado = {col: float(valor) for col, valor in zip(cubo_ventas.MEDIDAS, fila)}
+        resultado['Ordenes'] = int(fila[-1])
+        return resultado
+
+    def agrupar(self, seleccion, por, medidas=None):
+        """Medidas de la selección agrupadas por `por` (sin grupos NULL), como CuboVentas.agrupar."""
+        claves = [por] if isinstance(por, str) else list(por)
+        medidas = list(medidas or cubo_ventas.MEDIDAS)
+        where, params = self._where(seleccion, no_nulas=claves)
+        columnas = ', '.join(_columna(col) for col in claves)
+        totales = ', '.join(
+            'COUNT(DISTINCT "ID") AS "Ordenes"' if col == 'Ordenes' else f'TOTAL("{col}") AS "{col}"' for col in medidas
+        )
+        resultado = self._consulta(
+            f"SELECT {columnas}, {totales} FROM ventas WHERE {where} GROUP BY {columnas} ORDER BY {columnas}", params
+        )
+        # Sin filas, read_sql_query deja las columnas como object
+        resultado = resultado.astype({col: 'int64' if col == 'Ordenes' else 'float64' for col in medidas})
+        if 'Dia' in claves:
+            resultado['Dia'] = pd.to_datetime(resultado['Dia'], unit='D')
+        return resultado.set_index(por)
@@ -1,106 +1,67 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
-import plotly.graph_objects as go
+
+import graficos
+import instrumentacion
+import panel_exportacion
+import registro_datos
+import reportes
+
+# Fechas de importación por página en el detalle expandible
+FECHAS_POR_PAGINA = 10
 
 def pagina_importaciones():
     st.title("Dashboard de Importaciones")
+    # Datos compartidos por todas las sesiones (se cargan una vez por versión)
+    try:
+        importaciones = registro_datos.obtener("importaciones")
+    except Exception as e:
+        st.error(f"No se pudieron cargar los datos de importaciones: {str(e)}")
+        st.stop()
+    version, df_importaciones = importaciones.version, importaciones.datos
+    # Venta de los lotes, precalculada una vez por versión de importaciones y ventas
+    try:
+        venta_categorias = registro_datos.obtener("venta_categorias")
+    except Exception as e:
+        st.warning(f"No se pudo calcular la cantidad vendida de las importaciones: {str(e)}")
+        venta_categorias = None
+    version_venta = venta_categorias.version if venta_categorias is not None else None
+    
     #SEGUNDO GRAFICO
-    @st.cache_data
-    def load_importaciones():
-        version = datetime.now().strftime("%Y%m%d%H%M%S")
-        url_importaciones = f"https://raw.githubusercontent.com/HUHU0101123/og-app/main/importaciones.csv?v={version}"
-        df_importaciones = pd.read_csv(url_importaciones)
-        
-        # Clean and rename columns
-        df_importaciones.columns = df_importaciones.columns.str.strip().str.upper().str.replace(' ', '_')
-        df_importaciones = df_importaciones.rename(columns={
-            'FECHA_IMPORTACION': 'fecha_importacion',
-            'CATEGORIA': 'Categoria',
-            'STOCK_INICIAL': 'cantidad'
-        })
-        
-        # Ensure fecha_importacion is of type date
-        df_importaciones['fecha_importacion'] = pd.to_datetime(df_importaciones['fecha_importacion']).dt.date
-        
-        return df_importaciones
-    
-    # Load importaciones data
-    df_importaciones = load_importaciones()
+    # Gráfico por fecha de importación, reutilizado al volver a una fecha ya vista
+    @st.cache_data(max_entries=64)
+    def figura_importaciones(version, version_venta, fecha_importacion, _df_importaciones, _venta_categorias):
+        if _venta_categorias is None:
+            df_filtrado = _df_importaciones[_df_importaciones['Fecha_Importacion'] == fecha_importacion]
+            importaciones_agrupadas = (
+                df_filtrado.groupby(['CATEGORIA'])['STOCK INICIAL'].sum().reset_index()
+                .rename(columns={'CATEGORIA': 'Categoria', 'STOCK INICIAL': 'cantidad'})
+            )
+        else:
+            tabla = _venta_categorias.reset_index()
+            importaciones_agrupadas = tabla[tabla['Fecha_Importacion'] == fecha_importacion].rename(columns={
+                'CATEGORIA': 'Categoria', 'STOCK INICIAL': 'cantidad',
+                'Cantidad Vendida': 'vendida', '% Vendido': 'porcentaje',
+            })
+        return graficos.figura_importaciones(importaciones_agrupadas, fecha_importacion)
     
     if df_importaciones.empty:
         st.warning("No se pudieron cargar datos de importaciones.")
     else:
         st.subheader("Resumen de Importaciones")
     
-        # Convert fecha_importacion to string before grouping
-        df_importaciones['fecha_importacion'] = df_importaciones['fecha_importacion'].astype(str)
-    
         # Add a filter for fecha_importacion
-        fechas = df_importaciones['fecha_importacion'].unique()
+        fechas = df_importaciones['Fecha_Importacion'].unique()
         fecha_seleccionada = st.selectbox("Seleccionar Fecha de Importación", fechas)
     
-        # Filter the data based on selected fecha_importacion
-        df_filtrado = df_importaciones[df_importaciones['fecha_importacion'] == fecha_seleccionada]
-    
-        # Group by categoria
-        importaciones_agrupadas = df_filtrado.groupby(['Categoria'])['cantidad'].sum().reset_index()
-    
         # Create the bar chart
-        fig = go.Figure()
-    
-        # Add bars for each category
-        for _, row in importaciones_agrupadas.iterrows():
-            fig.add_trace(go.Bar(
-                x=[row['cantidad']],
-                y=[row['Categoria']],
-                name=row['Categoria'],
-                orientation='h',
-                hoverinfo='skip',  # Desactiva las tooltips para las barras
-                text=[row['cantidad']],  # Muestra la cantidad al final de la barra
-                textposition='outside'  # Posiciona el texto al final de la barra
-            ))
-    
-            # Add the 'cantidad vendida' line at x=0
-            fig.add_trace(go.Scatter(
-                x=[0],  # X position of the line
-                y=[row['Categoria']],  # Y position of the line
-                mode='lines+text',
-                line=dict(color='red', dash='dash'),
-                name='Cantidad Vendida (0%)',
-                text=['0%'],  # Text to display on the line
-                textposition='top right',
-                showlegend=False,
-                hoverinfo='skip'  # Desactiva las tooltips para la línea
-            ))
-    
-        # Update layout with annotation
-        fig.update_layout(
-            title=f"Importaciones por Categoría para la Fecha: {fecha_seleccionada}",
-            xaxis_title="Cantidad de Prendas",
-            yaxis_title="Categoría",
-            yaxis=dict(type='category'),
-            xaxis=dict(
-                range=[-10, importaciones_agrupadas['cantidad'].max() * 1.1]
-            ),
-            barmode='group',
-            annotations=[
-                dict(
-                    x=0,
-                    y=-0.5,  # Position annotation below the chart
-                    xref='x',
-                    yref='paper',
-                    text="La línea roja representa la 'Cantidad Vendida' al 0% para cada categoría.",
-                    showarrow=False,
-                    font=dict(size=12, color="black"),
-                    align="center",
-                    bgcolor="rgba(255, 255, 255, 0.7)"
-                )
-            ]
-        )
-    
-        st.plotly_chart(fig, use_container_width=True)
+        with instrumentacion.etapa("importaciones.grafico"):
+            fig = figura_importaciones(
+                version, version_venta, fecha_seleccionada, df_importaciones,
+                venta_categorias.datos if venta_categorias is not None else None,
+            )
+            st.plotly_chart(fig, use_container_width=True)
     
     
     
@@ -115,60 +76,59 @@ def pagina_importaciones():
     
     
     #TABLA IMPORTACIONES
-    # Cargar los datos
-    try:
-        df_importaciones = pd.read_csv('importaciones.csv')
-    except FileNotFoundError:
-        st.error("No se pudo encontrar el archivo 'importaciones.csv'. Por favor, asegúrese de que el archivo existe en el directorio correcto.")
-        st.stop()
-    
-    # Reemplazar valores vacíos en la columna PRODUCTO con "Sin especificar"
-    df_importaciones['PRODUCTO'] = df_importaciones['PRODUCTO'].fillna('Sin especificar')
-    
     # Crear un filtro para SKU del Producto
     skus = ['Todos'] + list(df_importaciones['SKU del Producto'].unique())
     selected_sku = st.selectbox("Seleccione SKU del Producto", skus)
     
-    # Filtrar el dataframe basado en el SKU seleccionado
-    if selected_sku == 'Todos':
-        df_filtered = df_importaciones
-    else:
-        df_filtered = df_importaciones[df_importaciones['SKU del Producto'] == selected_sku]
-    
-    # Agrupar los datos por CATEGORIA, PRODUCTO y calcular el STOCK INICIAL total
-    grouped_data = df_filtered.groupby(['CATEGORIA', 'PRODUCTO'])['STOCK INICIAL'].sum().reset_index()
+    # Agrupar una sola vez por fecha, categoría y producto (se guarda por SKU seleccionado)
+    @st.cache_data(max_entries=64)
+    def create_nested_data(version, selected_sku, _df_importaciones):
+        # Filtrar el dataframe basado en el SKU seleccionado
+        if selected_sku == 'Todos':
+            df = _df_importaciones
+        else:
+            df = _df_importaciones[_df_importaciones['SKU del Producto'] == selected_sku]
+        detalle = df.groupby(['Fecha_Importacion', 'CATEGORIA', 'PRODUCTO'], dropna=False)['STOCK INICIAL'].sum().reset_index()
+        # Los totales por fecha incluyen las filas sin categoría, igual que antes
+        totales = detalle.groupby('Fecha_Importacion')['STOCK INICIAL'].sum().reindex(pd.unique(df['Fecha_Importacion']))
+        detalle = detalle.dropna(subset=['CATEGORIA', 'PRODUCTO']).set_index('Fecha_Importacion').sort_index()
+        return totales, detalle
+    
+    with instrumentacion.etapa("importaciones.detalle"):
+        totales_por_fecha, detalle = create_nested_data(version, selected_sku, df_importaciones)
     
     # Calcular el total de STOCK INICIAL
-    total_stock = grouped_data['STOCK INICIAL'].sum()
+    total_stock = detalle['STOCK INICIAL'].sum()
     st.markdown(f"**Total de Stock Inicial:** {total_stock}")
     
-    def create_nested_data(df):
-        nested_data = []
-        for fecha in df['Fecha_Importacion'].unique():
-            fecha_data = df[df['Fecha_Importacion'] == fecha]
-            total_fecha = fecha_data['STOCK INICIAL'].sum()
-            
-            # Agrupar por categoría, producto y sumar el STOCK INICIAL
-            grouped_data = fecha_data.groupby(['CATEGORIA', 'PRODUCTO'])['STOCK INICIAL'].sum().reset_index()
-            nested_data.append({
-                "Fecha": fecha,
-                "Total": total_fecha,
-                "Detalles": grouped_data
-            })
-        
-        return nested_data
-    
-    nested_data = create_nested_data(df_filtered)
-    
     st.markdown("**Detalle de Importaciones por Fecha**")
+    # Solo se arman y envían al navegador las fechas de la página actual
+    n_paginas = max(1, -(-len(totales_por_fecha) // FECHAS_POR_PAGINA))
+    pagina = st.number_input("Página", min_value=1, max_value=n_paginas, value=1) if n_paginas > 1 else 1
+    inicio = (pagina - 1) * FECHAS_POR_PAGINA
+    
     # Mostrar los datos de manera expandible y ordenada
-    for item in nested_data:
-        with st.expander(f"Fecha: {item['Fecha']}  |  **Total: {item['Total']}** unidades"):
-            st.markdown(f"**Fecha de Importación:** `{item['Fecha']}`")
-            st.markdown(f"**Total de Stock Inicial:** `{item['Total']}`")
+    for fecha, total in totales_por_fecha.iloc[inicio:inicio + FECHAS_POR_PAGINA].items():
+        with st.expander(f"Fecha: {fecha}  |  **Total: {total}** unidades"):
+            st.markdown(f"**Fecha de Importación:** `{fecha}`")
+            st.markdown(f"**Total de Stock Inicial:** `{total}`")
             # Mostrar detalles en una tabla
             st.markdown("**Desglose por Categoría y Producto:**")
-            detalles_df = item["Detalles"]
+            detalles_df = detalle.loc[fecha:fecha].reset_index(drop=True)
             st.dataframe(detalles_df, use_container_width=True)
     
+    # Reporte descargable con el SKU seleccionado
+    st.subheader("Exportar")
+    def preparar_reporte():
+        lotes = None
+        if venta_categorias is not None:
+            lotes = venta_categorias.dependencias['venta_lotes'].datos
+            if selected_sku != 'Todos':
+                lotes = lotes[lotes['SKU del Producto'] == selected_sku]
+        totales = totales_por_fecha.rename('STOCK INICIAL').rename_axis('Fecha_Importacion').reset_index()
+        return totales, detalle.reset_index(), lotes
+    panel_exportacion.panel_exportacion(
+        "reporte_importaciones", reportes.reporte_importaciones, preparar_reporte, key="exportacion_importaciones"
+    )
+    
     st.markdown("___")
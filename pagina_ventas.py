@@ -1,59 +1,45 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, date
+
+import graficos
+import instrumentacion
+import kpis
+import motor_ventas
+import panel_exportacion
+import preprocesamiento
+import registro_datos
+import reportes
+import series_tiempo
+import tabla_paginada
+
+# Dimensiones por las que se pueden comparar los KPIs entre segmentos
+DIMENSIONES_COMPARACION = ['Región de Envío', 'Nombre de Pago', 'Estado del Pago', 'Categoria', 'Tipo de Venta']
+
+# Función para formatear números al estilo chileno
+def format_chilean_currency(value, is_percentage=False):
+    if is_percentage:
+        return f"{value:.2f}%".replace('.', ',')
+    else:
+        return f"${value:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
 def pagina_ventas():
     st.title("Dashboard de Ventas")
 
-    # Función para formatear números al estilo chileno
-    def format_chilean_currency(value, is_percentage=False):
-        if is_percentage:
-            return f"{value:.2f}%".replace('.', ',')
-        else:
-            return f"${value:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    
-    # Cargar los archivos CSV desde GitHub sin caché
-    @st.cache_data(ttl=3600)
+    # Datos compartidos por todas las sesiones (se cargan una vez por versión)
     def load_data():
         try:
-            version = datetime.now().strftime("%Y%m%d%H%M%S")
-            url_main = f"https://raw.githubusercontent.com/HUHU0101123/og-app/main/datasource.csv?v={version}"
-            df_main = pd.read_csv(url_main)
-            url_categorias = f"https://raw.githubusercontent.com/HUHU0101123/og-app/main/categorias.csv?v={version}"
-            df_categorias = pd.read_csv(url_categorias)
-            return df_main, df_categorias
+            # Las ventas con las que se construyó el motor, aunque en el medio se publique otra versión
+            motor = registro_datos.obtener("motor_ventas")
+            ventas = motor.dependencias["ventas"]
+            return ventas.version, ventas.datos, motor.datos
         except Exception as e:
             st.error(f"Error al cargar los datos: {str(e)}")
-            return None, None
-    
-    # Preprocesamiento de datos
-    def preprocess_data(df_main, df_categorias):
-        try:
-            df_main['Fecha'] = pd.to_datetime(df_main['Fecha'], errors='coerce')
-            df = pd.merge(df_main, df_categorias, on='SKU del Producto', how='left')
-            columns_to_fill = ['Estado del Pago', 'Fecha', 'Moneda', 'Región de Envío', 'Nombre del método de envío', 'Cupones', 'Nombre de Pago']
-            df[columns_to_fill] = df.groupby('ID')[columns_to_fill].fillna(method='ffill')
-            numeric_columns = ['Cantidad de Productos', 'Precio del Producto', 'Margen del producto (%)', 'Descuento del producto']
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.'), errors='coerce')
-            df['Total Productos'] = df.groupby('ID')['Cantidad de Productos'].transform('sum')
-            df['Tipo de Venta'] = df['Total Productos'].apply(lambda x: 'Mayorista' if x >= 6 else 'Detalle')
-            df['Ventas Netas'] = (df['Precio del Producto'] - df['Descuento del producto']) * df['Cantidad de Productos']
-            return df
-        except Exception as e:
-            st.error(f"Error en el preprocesamiento de datos: {str(e)}")
-            return None
-    
-    # Cargar y preprocesar los datos
-    df_main, df_categorias = load_data()
-    if df_main is None or df_categorias is None:
-        st.error("No se pudieron cargar los datos. Por favor, intente nuevamente más tarde.")
-        return
+            return None, None, None
 
-    df = preprocess_data(df_main, df_categorias)
+    version, df, motor = load_data()
     if df is None:
-        st.error("Error en el preprocesamiento de los datos. Por favor, revise el formato de los archivos CSV.")
+        st.error("No se pudieron cargar los datos. Por favor, intente nuevamente más tarde.")
         return
 
     # Filtros en la barra lateral
@@ -77,7 +63,8 @@ def pagina_ventas():
     # Otros filtros
     categories = st.sidebar.multiselect("Categorías", options=df['Categoria'].unique() if 'Categoria' in df.columns else [])
     sale_type = st.sidebar.multiselect("Tipo de Venta", options=df['Tipo de Venta'].unique() if 'Tipo de Venta' in df.columns else [])
-    order_ids = st.sidebar.text_input("IDs de Orden de Compra (separados por coma)", "")
+    # La caja de IDs de orden la dibuja el fragmento de resultados: al escribir en ella solo se vuelve a ejecutar ese fragmento
+    caja_ids = st.sidebar.container()
     regions = st.sidebar.multiselect("Región de Envío", options=df['Región de Envío'].unique() if 'Región de Envío' in df.columns else [])
     payment_status = st.sidebar.multiselect("Estado del Pago", options=df['Estado del Pago'].unique() if 'Estado del Pago' in df.columns else [])
     payment_names = st.sidebar.multiselect("Nombre de Pago", options=df['Nombre de Pago'].unique() if 'Nombre de Pago' in df.columns else [])
@@ -89,44 +76,32 @@ def pagina_ventas():
     date_range_dt[1] = date_range_dt[1] + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)  # End of the day
 
     # Apply filters
-    mask = (df['Fecha'] >= date_range_dt[0]) & (df['Fecha'] <= date_range_dt[1])
+    filtros = {
+        'Categoria': categories,
+        'Tipo de Venta': sale_type,
+        'Región de Envío': regions,
+        'Estado del Pago': payment_status,
+        'Nombre de Pago': payment_names,
+    }
+    filtros = {col: valores for col, valores in filtros.items() if col in df.columns and valores}
+    resultados_ventas(version, df, motor, date_range_dt, filtros, caja_ids)
 
-    if 'Categoria' in df.columns and categories:
-        mask &= df['Categoria'].isin(categories)
-    if 'Tipo de Venta' in df.columns and sale_type:
-        mask &= df['Tipo de Venta'].isin(sale_type)
+
+# Las secciones con controles propios son fragmentos: al cambiar la granularidad o
+# la página de la tabla solo se vuelve a ejecutar esa sección, con los mismos filtros
+@st.fragment
+def resultados_ventas(version, df, motor, date_range_dt, filtros, caja_ids):
+    # KPIs, gráficos, tabla y exportación dependen de los IDs de orden; el resto de la página no
+    order_ids = caja_ids.text_input("IDs de Orden de Compra (separados por coma)", "")
     if order_ids:
         order_id_list = [int(id.strip()) for id in order_ids.split(',') if id.strip().isdigit()]
-        mask &= df['ID'].isin(order_id_list)
-    if 'Región de Envío' in df.columns and regions:
-        mask &= df['Región de Envío'].isin(regions)
-    if 'Estado del Pago' in df.columns and payment_status:
-        mask &= df['Estado del Pago'].isin(payment_status)
-    if 'Nombre de Pago' in df.columns and payment_names:
-        mask &= df['Nombre de Pago'].isin(payment_names)
-    
-    filtered_df = df[mask]
+        filtros = {**filtros, 'ID': order_id_list}
 
-    # Calcular las ventas totales
-    ventas_totales = (filtered_df['Precio del Producto'] * filtered_df['Cantidad de Productos']).sum()
-    
-    # Calcular ventas netas después de impuestos
-    ventas_netas = filtered_df['Ventas Netas'].sum()
-    ventas_netas_despues_impuestos = ventas_netas * (1 - 0.19)
-    
-    # Calcular el costo del producto
-    filtered_df['Precio Neto del Producto'] = filtered_df['Precio del Producto'] - filtered_df['Descuento del producto']
-    filtered_df['Costo del Producto'] = filtered_df['Precio Neto del Producto'] * (1 - filtered_df['Margen del producto (%)'] / 100)
-    costo_total = (filtered_df['Costo del Producto'] * filtered_df['Cantidad de Productos']).sum()
-    
-    # Calcular el beneficio bruto
-    beneficio_bruto = ventas_netas - costo_total
-    
-    # Calcular el beneficio bruto después de impuestos
-    beneficio_bruto_despues_impuestos = beneficio_bruto * (1 - 0.19)
-    
-    # Calcular el margen
-    margen_bruto = (beneficio_bruto / ventas_netas) * 100 if ventas_netas > 0 else 0
+    # Los KPIs y gráficos se responden con el motor de consultas (cubo en memoria o SQLite)
+    seleccion = motor.seleccionar(date_range_dt[0], date_range_dt[1], filtros)
+    with instrumentacion.etapa("ventas.kpis"):
+        # Todas las métricas de las tarjetas salen de los totales de la selección
+        kpi = kpis.calcular(motor.totales(seleccion))
 
     # Resumen de Ventas
     st.header("Resumen de Ventas")
@@ -137,7 +112,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Ventas Totales</strong><br>
-            <span style="color: black;">{format_chilean_currency(ventas_totales)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Ventas Totales'])}</span>
             <p style='font-size:10px; color: black;'>Ingresos totales antes de descuentos y ajustes.</p>
         </div>
         """,
@@ -149,7 +124,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Descuentos Aplicados</strong><br>
-            <span style="color: black;">{format_chilean_currency(filtered_df['Descuento del producto'].sum())}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Descuentos'])}</span>
             <p style='font-size:10px; color: black;'>Total de descuentos otorgados en ventas.</p>
         </div>
         """,
@@ -161,7 +136,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Ventas Netas</strong><br>
-            <span style="color: black;">{format_chilean_currency(ventas_netas)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Ventas Netas'])}</span>
             <p style='font-size:10px; color: black;'>Ventas totales menos descuentos (Jumpseller).</p>
         </div>
         """,
@@ -173,7 +148,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Ventas Netas Después de Impuestos</strong><br>
-            <span style="color: black;">{format_chilean_currency(ventas_netas_despues_impuestos)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Ventas Netas Después de Impuestos'])}</span>
             <p style='font-size:10px; color: black;'>Ventas netas menos impuestos del 19%.</p>
         </div>
         """,
@@ -189,7 +164,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Cantidad de Órdenes</strong><br>
-            <span style="color: black;">{filtered_df['ID'].nunique()}</span>
+            <span style="color: black;">{kpi['Ordenes']}</span>
             <p style='font-size:10px; color: black;'>Total de órdenes procesadas.</p>
         </div>
         """,
@@ -201,7 +176,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Ganancia Bruta</strong><br>
-            <span style="color: black;">{format_chilean_currency(beneficio_bruto)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Ganancia Bruta'])}</span>
             <p style='font-size:10px; color: black;'>Ventas netas menos costos de adquisición del producto.</p>
         </div>
         """,
@@ -213,7 +188,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #FFCCCB; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Ganancia Neta</strong><br>
-            <span style="color: black;">{format_chilean_currency(beneficio_bruto_despues_impuestos)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Ganancia Neta'])}</span>
             <p style="font-size:10px; color: black;">Es el dinero que realmente ganaste. Es tuyo.</p>
         </div>
         """,
@@ -225,7 +200,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #FFCCCB; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Margen</strong><br>
-            <span style="color: black;">{format_chilean_currency(margen_bruto, is_percentage=True)}</span>
+            <span style="color: black;">{format_chilean_currency(kpi['Margen'], is_percentage=True)}</span>
             <p style="font-size:10px; color: black;">% que te queda de las ventas después de pagar la inversión e impuestos.</p>
         </div>
         """,
@@ -243,7 +218,7 @@ def pagina_ventas():
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Cantidad Total de Productos</strong><br>
-            <span style="color: black;">{int(filtered_df['Cantidad de Productos'].sum())}</span>
+            <span style="color: black;">{int(kpi['Cantidad'])}</span>
             <p style='font-size:10px; color: black;'>Total de productos vendidos.</p>
         </div>
         """,
@@ -251,12 +226,11 @@ def pagina_ventas():
     )
     
     # Descuento Promedio %
-    descuento_promedio = (filtered_df['Descuento del producto'].sum() / ventas_totales * 100) if ventas_totales > 0 else 0
     col2.markdown(
         f"""
         <div style="background-color: #D3D3D3; padding: 10px; border-radius: 5px; text-align: center;">
             <strong style="color: black;">Descuento Promedio %</strong><br>
-            <span style="color: black;">{descuento_promedio:.2f}%</span>
+            <span style="color: black;">{kpi['Descuento Promedio']:.2f}%</span>
             <p style='font-size:10px; color: black;'>Porcentaje promedio de descuento aplicado.</p>
         </div>
         """,
@@ -266,77 +240,128 @@ def pagina_ventas():
     col3.markdown("")
     col4.markdown("")
     
+    # Los mismos KPIs para cada segmento de una dimensión, en una sola consulta
+    with st.expander("Comparación por segmento"):
+        comparacion_segmentos(motor, seleccion)
+    
     # Gráficos
     col1, col2 = st.columns(2)
-    with col1:
+    with col1, instrumentacion.etapa("ventas.grafico_sku"):
         # Calcular las ventas netas y cantidad de productos por SKU y categoría
-        sales_data = filtered_df.groupby(['Categoria', 'SKU del Producto']).agg(
-            Ventas_Netas=('Ventas Netas', 'sum'),
-            Cantidad_Productos=('Cantidad de Productos', 'sum')
+        sales_data = motor.agrupar(seleccion, ['Categoria', 'SKU del Producto'], ['Ventas Netas', 'Cantidad']).rename(
+            columns={'Ventas Netas': 'Ventas_Netas', 'Cantidad': 'Cantidad_Productos'}
         ).reset_index()
         
-        # Crear un gráfico de barras para ventas netas por categoría y SKU
-        fig = px.bar(
-            sales_data,
-            x='Categoria',
-            y='Ventas_Netas',
-            color='SKU del Producto',
-            title="Ventas Netas por Categoría y SKU",
-            labels={'Ventas_Netas': 'Ventas Netas'},
-            hover_data={'SKU del Producto': True, 'Cantidad_Productos': True}
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # Crear un gráfico de barras para ventas netas por categoría y SKU (una traza por SKU)
+        st.plotly_chart(graficos.figura_ventas_sku(sales_data), use_container_width=True)
     
     with col2:
-        # Ventas diarias: Ventas Totales, Ventas Netas y Ganancia Neta
-        daily_sales = filtered_df.groupby('Fecha').agg(
-            Ventas_Totales=('Precio del Producto', lambda x: (x * filtered_df.loc[x.index, 'Cantidad de Productos']).sum()),
-            Ventas_Netas=('Ventas Netas', 'sum')
-        ).reset_index()
+        grafico_series(motor, seleccion)
+    
+    # Top productos vendidos
+    with instrumentacion.etapa("ventas.grafico_top"):
+        top_products = motor.agrupar(seleccion, 'SKU del Producto', ['Cantidad'])['Cantidad'].sort_values(ascending=False).head(10)
+        fig = px.bar(top_products, x=top_products.index, y=top_products.values, title="Top 10 Productos Más Vendidos")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Descuentos por categoría
+    with instrumentacion.etapa("ventas.grafico_descuentos"):
+        discounts_by_category = motor.agrupar(seleccion, 'Categoria', ['Descuentos'])['Descuentos'].sort_values(ascending=False)
+        fig = px.bar(discounts_by_category, x=discounts_by_category.index, y=discounts_by_category.values, title="Descuentos por Categoría")
+        st.plotly_chart(fig, use_container_width=True)
     
-        # Calcular la Ganancia Neta diaria
-        daily_sales['Ganancia_Neta'] = daily_sales['Ventas_Netas'] - (daily_sales['Ventas_Netas'] * 0.19)
+    # Tabla de datos (paginada en el servidor)
+    st.subheader("Datos Detallados")
+    estado_filtros = (version, tuple(date_range_dt), tuple((col, tuple(map(str, valores))) for col, valores in filtros.items()))
+    tabla_detalle(df, motor_ventas.FilasSeleccion(motor, seleccion), estado_filtros)
+
+    # Reporte descargable del estado actual de los filtros
+    st.subheader("Exportar")
+    exportacion_ventas(version, df, motor, seleccion, kpi, date_range_dt, filtros)
+
+
+@st.fragment
+def grafico_series(motor, seleccion):
+    with instrumentacion.etapa("ventas.grafico_series"):
+        # Desarrollo de Ventas Totales, Ventas Netas y Ganancia Neta por día, semana o mes
+        granularidad = st.radio("Granularidad", list(series_tiempo.FRECUENCIAS), horizontal=True, key="granularidad_ventas")
+        ventas_periodo = series_tiempo.agregar_series(
+            motor.agrupar(seleccion, 'Dia', ['Ventas Totales', 'Ventas Netas']).reset_index(), granularidad, columna_fecha='Dia'
+        )
+        titulo = f"Desarrollo {series_tiempo.TITULOS[granularidad]} de Ventas Totales, Ventas Netas y Ganancia Neta"
     
-        if len(daily_sales) > 1:
-            # Crear un gráfico de líneas para múltiples días
+        if len(ventas_periodo) > 1:
+            # Crear un gráfico de líneas para múltiples períodos
             fig = px.line(
-                daily_sales,
+                ventas_periodo,
                 x='Fecha',
                 y=['Ventas_Totales', 'Ventas_Netas', 'Ganancia_Neta'],
                 labels={'value': 'Monto', 'variable': 'Métrica'},
-                title="Desarrollo Diario de Ventas Totales, Ventas Netas y Ganancia Neta"
+                title=titulo
             )
         else:
-            # Crear un gráfico de dispersión para un solo día
+            # Crear un gráfico de dispersión para un solo período
             fig = px.scatter(
-                daily_sales,
+                ventas_periodo,
                 x='Fecha',
                 y=['Ventas_Totales', 'Ventas_Netas', 'Ganancia_Neta'],
                 labels={'value': 'Monto', 'variable': 'Métrica'},
-                title="Desarrollo Diario de Ventas Totales, Ventas Netas y Ganancia Neta"
+                title=titulo
             )
     
         # Configurar el formato de fecha en el eje X
         fig.update_xaxes(
-            tickformat="%d-%m-%Y",  # Formato de fecha: día-mes-año
+            tickformat=series_tiempo.FORMATOS_FECHA[granularidad],
             title="Fecha"
         )
     
         st.plotly_chart(fig, use_container_width=True)
-    
-    # Top productos vendidos
-    top_products = filtered_df.groupby('SKU del Producto')['Cantidad de Productos'].sum().sort_values(ascending=False).head(10)
-    fig = px.bar(top_products, x=top_products.index, y=top_products.values, title="Top 10 Productos Más Vendidos")
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Descuentos por categoría
-    discounts_by_category = filtered_df.groupby('Categoria')['Descuento del producto'].sum().sort_values(ascending=False)
-    fig = px.bar(discounts_by_category, x=discounts_by_category.index, y=discounts_by_category.values, title="Descuentos por Categoría")
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Tabla de datos
-    st.subheader("Datos Detallados")
-    st.dataframe(filtered_df)
+
+
+@st.fragment
+def comparacion_segmentos(motor, seleccion):
+    with instrumentacion.etapa("ventas.comparacion"):
+        dimension = st.selectbox("Comparar por", DIMENSIONES_COMPARACION, key="comparacion_ventas")
+        tabla = kpis.por_segmento(motor, seleccion, dimension)
+        formatos = {col: format_chilean_currency for col in tabla.columns}
+        formatos.update({
+            'Ordenes': '{:d}',
+            'Cantidad': '{:.0f}',
+            'Margen': lambda valor: format_chilean_currency(valor, is_percentage=True),
+            'Descuento Promedio': lambda valor: format_chilean_currency(valor, is_percentage=True),
+        })
+        st.dataframe(tabla.style.format(formatos), use_container_width=True)
+
+
+@st.fragment
+def tabla_detalle(df, filas, estado_filtros):
+    # Las posiciones se piden al motor recién acá, y sin búsqueda ni orden solo las de la página
+    with instrumentacion.etapa("ventas.tabla"):
+        tabla_paginada.tabla_paginada(df, estado_filtros, key="datos_detallados", posiciones=filas)
+
+@st.fragment
+def exportacion_ventas(version, df, motor, seleccion, kpi, date_range_dt, filtros):
+    def preparar():
+        with instrumentacion.etapa("ventas.exportacion"):
+            resumen = pd.DataFrame(
+                [('Desde', f"{date_range_dt[0]:%d-%m-%Y}"), ('Hasta', f"{date_range_dt[1]:%d-%m-%Y}")]
+                + [(f"Filtro {col}", ', '.join(map(str, valores))) for col, valores in filtros.items()]
+                + list(kpi.items()),
+                columns=['Indicador', 'Valor'],
+            )
+            por_sku = kpis.por_segmento(motor, seleccion, ['Categoria', 'SKU del Producto']).reset_index()
+            por_dia = kpis.por_segmento(motor, seleccion, 'Dia').reset_index()
+            # El proceso de reportes lee las líneas del snapshot en disco; si no está (o se
+            # borró al publicarse otra versión antes de enlazarlo), se le envían
+            filas = motor.filas(seleccion)
+            ruta = preprocesamiento.ruta_snapshot(version)
+            detalle = reportes.fijar(ruta, filas) if ruta is not None else None
+            if detalle is None:
+                detalle = df.iloc[filas]
+        return resumen, por_sku, por_dia, detalle
+
+    panel_exportacion.panel_exportacion("reporte_ventas", reportes.reporte_ventas, preparar, key="exportacion_ventas")
+
 
 if __name__ == "__main__":
     pagina_ventas()
@@ -0,0 +1,48 @@
+import os
+
+import streamlit as st
+
+import instrumentacion
+
+# El panel solo aparece si la URL trae ?admin=<OG_APP_ADMIN_TOKEN>
+TOKEN_ADMIN = os.environ.get("OG_APP_ADMIN_TOKEN")
+
+
+def es_admin():
+    return bool(TOKEN_ADMIN) and st.query_params.get("admin") == TOKEN_ADMIN
+
+
+def perfilar_activado():
+    return st.session_state.get("perfilar_rerun", False)
+
+
+def mostrar(ejecucion):
+    """Panel de rendimiento en la barra lateral para la re-ejecución `ejecucion`."""
+    # pandas y los datos se importan recién aquí para no demorar el inicio de la app
+    import pandas as pd
+
+    import registro_datos
+
+    with st.sidebar.expander("Rendimiento (admin)"):
+        st.checkbox("Perfilar la próxima ejecución con cProfile", key="perfilar_rerun")
+
+        st.markdown("**Última ejecución**")
+        ultima = pd.Series(ejecucion["etapas"], name="segundos").sort_values(ascending=False)
+        st.dataframe(ultima.round(4), use_container_width=True)
+
+        datos = instrumentacion.resumen()
+        st.markdown("**Percentiles por etapa (segundos)**")
+        st.dataframe(pd.DataFrame(datos["etapas"]).T.round(4), use_container_width=True)
+        st.markdown("**Cachés**")
+        st.dataframe(pd.DataFrame(datos["caches"]).T.fillna(0).astype(int), use_container_width=True)
+        st.markdown("**Memoria (MB)**")
+        memoria = {"proceso (RSS)": datos["memoria_bytes"], **registro_datos.memoria()}
+        st.dataframe(pd.Series(memoria, name="MB", dtype="float64").div(2**20).round(1), use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        col1.download_button("JSON", instrumentacion.exportar_json(), "rendimiento.json", "application/json")
+        col2.download_button("Prometheus", instrumentacion.exportar_prometheus(), "rendimiento.prom", "text/plain")
+
+        if "perfil" in ejecucion:
+            st.markdown("**Perfil de cProfile**")
+            st.code(ejecucion["perfil"], language="text")
@@ -0,0 +1,57 @@
+import os
+
+import streamlit as st
+
+import reportes
+
+
+def _leer(ruta):
+    # El archivo se lee recién cuando el usuario pide la descarga
+    def leer():
+        with open(ruta, 'rb') as f:
+            return f.read()
+    return leer
+
+
+@st.fragment(run_every=1)
+def _progreso(trabajo):
+    # Mientras el reporte se genera solo se revisa este fragmento; al terminar se muestra el botón de descarga
+    if trabajo.futuro.done():
+        st.rerun()
+    st.info("Generando el reporte...")
+
+
+def panel_exportacion(nombre, generar, preparar, key="exportacion"):
+    """Genera un reporte en el proceso de reportes y ofrece descargarlo cuando está listo.
+
+    Al pedir el reporte se llama a `preparar()`, que devuelve los argumentos de
+    `generar` (una función de `reportes`), así que no cuesta nada hasta entonces.
+    """
+    col1, col2 = st.columns([3, 1])
+    formato = col1.radio("Formato", list(reportes.FORMATOS), horizontal=True, key=f"{key}_formato")
+    col1.caption("Con muchas filas el CSV (un zip con un archivo por hoja) se genera bastante más rápido que el Excel.")
+    clave_trabajo = f"_{key}_trabajo"
+    if col2.button("Generar reporte", key=f"{key}_generar"):
+        anterior = st.session_state.pop(clave_trabajo, None)
+        if anterior is not None:
+            # El archivo del reporte anterior se borra apenas termine (o ya mismo si terminó)
+            anterior.futuro.add_done_callback(lambda _: reportes.borrar(anterior))
+        st.session_state[clave_trabajo] = reportes.enviar(generar, formato, *preparar())
+
+    trabajo = st.session_state.get(clave_trabajo)
+    if trabajo is None:
+        return
+    if trabajo.futuro.done() and not os.path.exists(trabajo.ruta):
+        # Se borró por antigüedad (reportes.ANTIGUEDAD_MAXIMA)
+        st.session_state.pop(clave_trabajo)
+        st.info("El reporte anterior expiró; se puede generar de nuevo.")
+        return
+    if not trabajo.futuro.done():
+        _progreso(trabajo)
+    elif trabajo.futuro.exception() is not None:
+        st.error(f"No se pudo generar el reporte: {trabajo.futuro.exception()}")
+    else:
+        st.download_button(
+            "Descargar reporte", data=_leer(trabajo.ruta), file_name=f"{nombre}.{trabajo.extension}",
+            mime=trabajo.mime, on_click="ignore", key=f"{key}_descargar",
+        )
@@ -0,0 +1,328 @@
+import glob
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import descargas
+import instrumentacion
+
+# Cambiar cuando cambie la lógica de preprocess_data para invalidar los snapshots en disco
+VERSION_PREPROCESO = "3"
+
+# Esquema de datasource.csv. Todas las columnas numéricas se convierten en el lector:
+# los montos usan coma decimal ("15000,00"), el margen punto decimal ("55.14") y
+# ID y Cantidad de Productos se infieren como números.
+COLUMNAS_TEXTO = [
+    'Estado del Pago', 'Moneda', 'SKU del Producto', 'Rentabilidad del producto',
+    'Región de Envío', 'Nombre del método de envío', 'Cupones', 'Nombre de Pago', 'Rut',
+]
+COLUMNAS_DECIMAL_COMA = ['Precio del Producto', 'Descuento del producto']
+# El margen viene con punto decimal, así que no puede pasar por decimal=',': lo convierte _decimal_punto
+COLUMNAS_DECIMAL_PUNTO = ['Margen del producto (%)']
+FORMATO_FECHA = '%Y-%m-%d %H:%M'
+# Textos con pocos valores distintos, que se guardan como categorías. Rut queda como
+# texto: es casi único por orden y como categoría ocuparía más.
+COLUMNAS_CATEGORICAS = [
+    'Estado del Pago', 'Moneda', 'SKU del Producto', 'Rentabilidad del producto', 'Región de Envío',
+    'Nombre del método de envío', 'Cupones', 'Nombre de Pago', 'Categoria', 'Sub-Categoria', 'Tipo de Venta',
+]
+# Los textos categóricos se leen directo como categorías, sin crear un string por fila
+ESQUEMA_DATASOURCE = {
+    **{col: 'category' if col in COLUMNAS_CATEGORICAS else object for col in COLUMNAS_TEXTO},
+    **{col: 'float64' for col in COLUMNAS_DECIMAL_COMA},
+}
+# Campos de la orden que solo vienen en la primera línea de cada ID
+COLUMNAS_ORDEN = ['Estado del Pago', 'Fecha', 'Moneda', 'Región de Envío', 'Nombre del método de envío', 'Cupones', 'Nombre de Pago']
+
+# datasource.csv solo crece (IDs crecientes): al refrescar se procesan solo las órdenes nuevas.
+# OG_APP_INGESTA_INCREMENTAL=0 vuelve a procesar el historial completo en cada cambio.
+INGESTA_INCREMENTAL = os.environ.get("OG_APP_INGESTA_INCREMENTAL", "1") != "0"
+# Bytes leídos hacia atrás en cada paso al buscar el inicio de la última orden
+BLOQUE_COLA = 1 << 16
+
+_lock = threading.Lock()
+# Los snapshots se escriben en segundo plano, de a uno y en orden, para no demorar la carga
+_escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+# (version, frame) del último frame preprocesado en este proceso
+_memo = None
+# Último `Incremento` aplicado, para que los agregados se actualicen con él
+_incremento = None
+
+
+class Incremento:
+    """Cambio de un frame de ventas al ingerir solo lo anexado a datasource.csv.
+
+    El frame nuevo es el anterior sin las filas `quitadas` (todas al final: la
+    última orden, que se vuelve a procesar completa) más las filas `nuevas`.
+    """
+
+    def __init__(self, version_anterior, version, quitadas, nuevas):
+        self.version_anterior = version_anterior
+        self.version = version
+        self.quitadas = quitadas
+        self.nuevas = nuevas
+
+
+def _decimal_punto(texto):
+    # Como el to_numeric(errors='coerce') anterior: vacío o inválido queda NaN
+    try:
+        return float(texto.replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+
+def leer_datasource(ruta):
+    """Lee datasource.csv con el esquema declarado, ya con números y fechas parseados."""
+    return pd.read_csv(
+        ruta,
+        dtype=ESQUEMA_DATASOURCE,
+        converters={col: _decimal_punto for col in COLUMNAS_DECIMAL_PUNTO},
+        decimal=',',
+        parse_dates=['Fecha'],
+        date_format=FORMATO_FECHA,
+    )
+
+
+def preprocess_data(df_main, df_categorias):
+    df_main = df_main.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df_main['Fecha']):
+        df_main['Fecha'] = pd.to_datetime(df_main['Fecha'], errors='coerce')
+    df = pd.merge(df_main, df_categorias, on='SKU del Producto', how='left')
+
+    # Una sola agrupación por ID para completar los campos de la orden y sumar productos
+    por_orden = df.groupby('ID', sort=False)
+    df[COLUMNAS_ORDEN] = por_orden[COLUMNAS_ORDEN].ffill()
+    df['Total Productos'] = por_orden['Cantidad de Productos'].transform('sum')
+    df['Tipo de Venta'] = np.where(df['Total Productos'] >= 6, 'Mayorista', 'Detalle').astype(object)
+    df['Ventas Netas'] = (df['Precio del Producto'] - df['Descuento del producto']) * df['Cantidad de Productos']
+    # Columnas derivadas calculadas una sola vez sobre el frame compartido
+    df['Precio Neto del Producto'] = df['Precio del Producto'] - df['Descuento del producto']
+    df['Costo del Producto'] = df['Precio Neto del Producto'] * (1 - df['Margen del producto (%)'] / 100)
+    return compactar(df)
+
+
+def compactar(df):
+    """Pasa `df` (en el lugar) a tipos compactos y lo devuelve.
+
+    Los textos de COLUMNAS_CATEGORICAS pasan a categorías (ordenadas
+    alfabéticamente), los enteros al tipo más angosto que los contiene y los
+    decimales a float32 solo si todos sus valores se representan exactos. Las
+    operaciones entre columnas angostas deben pasar antes a float64.
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            serie = df[col].astype('category')
+            if not serie.cat.categories.is_monotonic_increasing:
+                serie = serie.cat.reorder_categories(serie.cat.categories.sort_values())
+            df[col] = serie
+    for col in df.select_dtypes('integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in df.select_dtypes('float').columns:
+        angosta = df[col].astype('float32')
+        if np.array_equal(angosta.to_numpy(dtype='float64'), df[col].to_numpy(dtype='float64'), equal_nan=True):
+            df[col] = angosta
+    return df
+
+
+def _concatenar(anterior, nuevas):
+    # Las categorías de ambos frames se unen para que concat no pase las columnas a object
+    for col in anterior.select_dtypes('category').columns:
+        if col in nuevas.columns and isinstance(nuevas[col].dtype, pd.CategoricalDtype):
+            categorias = pd.CategoricalDtype(anterior[col].cat.categories.union(nuevas[col].cat.categories))
+            anterior = anterior.astype({col: categorias}) if anterior[col].dtype != categorias else anterior
+            nuevas = nuevas.astype({col: categorias})
+    df = pd.concat([anterior, nuevas], ignore_index=True)
+    # Como en un frame construido de cero, solo quedan las categorías presentes
+    # (bincount es mucho más barato que remove_unused_categories, que ordena los códigos)
+    for col in df.select_dtypes('category').columns:
+        codigos = df[col].cat.codes.to_numpy()
+        if not np.all(np.bincount(codigos[codigos >= 0], minlength=len(df[col].cat.categories))):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+
+def version_ventas(*descargas_fuente):
+    """Hash de contenido de las fuentes y de la versión del preprocesamiento."""
+    h = hashlib.sha256(VERSION_PREPROCESO.encode())
+    for d in descargas_fuente:
+        h.update(f"{d.nombre}:{d.version};".encode())
+    return h.hexdigest()[:16]
+
+
+def _ruta_snapshot(dir_cache, version):
+    return os.path.join(dir_cache, f"ventas-{version}.feather")
+
+
+def _guardar_snapshot(df, dir_cache, version):
+    ruta = _ruta_snapshot(dir_cache, version)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    # Sin compresión para que el proceso de reportes lo lea con memory mapping (reportes.Filas);
+    # al cargar el frame se copia entero a memoria de todas formas
+    df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+    os.replace(tmp, ruta)
+    for viejo in glob.glob(os.path.join(dir_cache, "ventas-*.feather")):
+        if viejo != ruta:
+            try:
+                os.remove(viejo)
+            except OSError:
+                pass
+
+
+def _id_linea(linea):
+    campo = linea.split(b',', 1)[0].strip(b'"\r ')
+    return int(campo) if campo.isdigit() else None
+
+
+def _inicio_ultima_orden(ruta, hasta):
+    """(offset, ID) de la primera línea de la última orden en los primeros `hasta` bytes.
+
+    Lee el archivo hacia atrás desde `hasta` hasta encontrar una línea de otra orden.
+    """
+    bloque = BLOQUE_COLA
+    with open(ruta, 'rb') as f:
+        while True:
+            desde = max(hasta - bloque, 0)
+            f.seek(desde)
+            lineas = f.read(hasta - desde).split(b'\n')
+            offsets = np.cumsum([desde] + [len(linea) + 1 for linea in lineas[:-1]])
+            ultimo_id, inicio = None, None
+            # La primera línea del bloque puede estar cortada, salvo al inicio del archivo
+            for linea, offset in zip(lineas[::-1], offsets[::-1]):
+                if offset == desde and desde > 0:
+                    break
+                id_linea = _id_linea(linea)
+                if ultimo_id is None:
+                    ultimo_id = id_linea
+                    inicio = offset if id_linea is not None else None
+                elif id_linea != ultimo_id:
+                    return int(inicio), ultimo_id
+                else:
+                    inicio = offset
+            if desde == 0:
+                return (int(inicio), ultimo_id) if ultimo_id is not None else (None, None)
+            bloque *= 2
+
+
+def _ingerir_anexado(df_anterior, main, df_categorias):
+    """Frame de ventas de `main` a partir del de su versión anterior, o None si no se puede.
+
+    Solo se leen las líneas desde el inicio de la última orden ya ingerida: esa
+    orden se vuelve a procesar completa por si el anexo trae más líneas suyas.
+    """
+    inicio, ultimo_id = _inicio_ultima_orden(main.ruta, main.anterior.tamano)
+    ids = df_anterior['ID']
+    if inicio is None or ids.empty or ids.iloc[-1] != ultimo_id:
+        return None
+    with open(main.ruta, 'rb') as f:
+        encabezado = f.readline()
+        f.seek(inicio)
+        cola = f.read()
+    df_cola = leer_datasource(io.BytesIO(encabezado + cola))
+    # Si la cola no sigue a la última orden con IDs crecientes el archivo no fue solo anexado
+    if df_cola.empty or df_cola['ID'].iloc[0] != ultimo_id or not df_cola['ID'].is_monotonic_increasing:
+        return None
+    conservadas = int(ids.searchsorted(ultimo_id, side='left'))
+    nuevas = preprocess_data(df_cola, df_categorias)
+    quitadas = df_anterior.iloc[conservadas:]
+    df = _concatenar(df_anterior.iloc[:conservadas], nuevas)
+    return df, quitadas, nuevas.set_axis(pd.RangeIndex(conservadas, len(df)))
+
+
+def _cargar_version(version, dir_cache):
+    # Frame preprocesado de `version` si está en memoria o en un snapshot
+    if _memo is not None and _memo[0] == version:
+        return _memo[1]
+    ruta = _ruta_snapshot(dir_cache, version)
+    if os.path.exists(ruta):
+        return feather.read_feather(ruta)
+    return None
+
+
+def incremento(version_anterior, version):
+    """El `Incremento` que llevó el frame de ventas de `version_anterior` a `version`, si fue el último."""
+    actual = _incremento
+    if actual is not None and actual.version_anterior == version_anterior and actual.version == version:
+        return actual
+    return None
+
+
+def _escribir_snapshot(df, dir_cache, version):
+    with instrumentacion.etapa("snapshot.escritura"):
+        _guardar_snapshot(df, dir_cache, version)
+
+
+def esperar_snapshots():
+    """Espera a que terminen las escrituras de snapshots pendientes."""
+    _escritor.submit(lambda: None).result()
+
+
+def ruta_snapshot(version, dir_cache=None):
+    """Ruta del snapshot Feather de `version` (esperando su escritura si está pendiente), o None si no existe."""
+    esperar_snapshots()
+    ruta = _ruta_snapshot(dir_cache or descargas.DIR_CACHE, version)
+    return ruta if os.path.exists(ruta) else None
+
+
+def _frame(descarga, parser):
+    # Frame parseado durante la descarga o, si no se descargó completo, leído de la copia en disco
+    return descarga.frame if descarga.frame is not None else parser(descarga.ruta)
+
+
+def cargar_ventas(url_base=None, dir_cache=None):
+    """Devuelve (version, frame) de ventas preprocesado.
+
+    Solo se preprocesa cuando cambia el contenido de datasource.csv o
+    categorias.csv; si no, se usa el frame en memoria o el snapshot Feather.
+    Si a datasource.csv solo se le anexaron líneas, se procesan únicamente esas
+    (y la última orden anterior) sobre el frame de la versión previa.
+    """
+    global _memo, _incremento
+    dir_cache = dir_cache or descargas.DIR_CACHE
+    # Las dos fuentes se piden a la vez; si llegan completas se parsean mientras se descargan
+    categorias = descargas.en_paralelo(
+        descargas.descargar, "categorias.csv", url_base=url_base, dir_cache=dir_cache, parser=pd.read_csv
+    )
+    descargar = descargas.descargar_anexado if INGESTA_INCREMENTAL else descargas.descargar
+    main = descargar("datasource.csv", url_base=url_base, dir_cache=dir_cache, parser=leer_datasource)
+    categorias = categorias.result()
+    version = version_ventas(main, categorias)
+
+    with _lock:
+        if _memo is not None and _memo[0] == version:
+            instrumentacion.contar("preproceso", "acierto")
+            return _memo
+
+        ruta = _ruta_snapshot(dir_cache, version)
+        if os.path.exists(ruta):
+            instrumentacion.contar("preproceso", "snapshot")
+            with instrumentacion.etapa("snapshot.lectura"):
+                df = feather.read_feather(ruta)
+        else:
+            df = None
+            if main.estado == descargas.ANEXADO:
+                version_anterior = version_ventas(main.anterior, categorias)
+                df_anterior = _cargar_version(version_anterior, dir_cache)
+                if df_anterior is not None:
+                    with instrumentacion.etapa("preproceso.incremental"):
+                        resultado = _ingerir_anexado(df_anterior, main, _frame(categorias, pd.read_csv))
+                    if resultado is not None:
+                        instrumentacion.contar("preproceso", "incremental")
+                        df, quitadas, nuevas = resultado
+                        _incremento = Incremento(version_anterior, version, quitadas, nuevas)
+            if df is None:
+                instrumentacion.contar("preproceso", "fallo")
+                with instrumentacion.etapa("parseo.datasource"):
+                    df_main = _frame(main, leer_datasource)
+                    df_categorias = _frame(categorias, pd.read_csv)
+                with instrumentacion.etapa("preproceso"):
+                    df = preprocess_data(df_main, df_categorias)
+            _escritor.submit(_escribir_snapshot, df, dir_cache, version)
+
+        _memo = (version, df)
+        return _memo
@@ -0,0 +1,296 @@
+"""Registro de los conjuntos de datos compartidos por todas las sesiones.
+
+Cada conjunto se carga y parsea una sola vez por versión de los datos y el
+mismo objeto se entrega a todas las sesiones del proceso (al estilo de
+st.cache_resource). Los frames entregados son de solo lectura: las páginas
+no deben modificarlos en el lugar (usar .assign(), .copy() o crear frames nuevos).
+
+Un hilo de fondo revalida los conjuntos cargados antes de que venzan y
+reconstruye sus derivados fuera de las re-ejecuciones; lo nuevo se publica
+todo junto al final. Mientras tanto, y si la revalidación falla, se siguen
+entregando las versiones anteriores.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import cubo_ventas
+import descargas
+import indice_filtros
+import instrumentacion
+import motor_ventas
+import preprocesamiento
+import venta_lotes
+
+# Segundos entre revalidaciones de un conjunto contra su origen
+TTL_REVALIDACION = 3600
+# El hilo de fondo revalida los conjuntos a los que les queden menos de estos segundos
+ANTICIPACION_REFRESCO = 300
+# Segundos entre revisiones del hilo de fondo
+INTERVALO_REFRESCO = 60
+
+
+class Conjunto:
+    def __init__(self, nombre, version, datos, dependencias=None):
+        self.nombre = nombre
+        self.version = version
+        self.datos = datos
+        # Conjuntos con los que se construyó (los derivados), por nombre
+        self.dependencias = dependencias or {}
+        self.validado_en = time.monotonic()
+
+    def __repr__(self):
+        return f"Conjunto({self.nombre!r}, version={self.version!r})"
+
+
+class _Definicion:
+    def __init__(self, cargador, depende_de, actualizador, con_version):
+        self.cargador = cargador
+        self.depende_de = tuple(depende_de)
+        self.actualizador = actualizador
+        self.con_version = con_version
+        self.lock = threading.Lock()
+
+
+_definiciones = {}
+_conjuntos = {}
+# Carga en paralelo de los conjuntos base (los que descargan) que necesita un conjunto derivado
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="registro")
+# Un solo refresco a la vez, sea del hilo de fondo o pedido por una página
+_lock_refresco = threading.Lock()
+_despertar = threading.Event()
+_hilo_refresco = None
+_lock_hilo = threading.Lock()
+
+
+def registrar(nombre, cargador, depende_de=(), actualizador=None, con_version=False):
+    """Registra un conjunto.
+
+    Sin dependencias, `cargador()` devuelve (version, datos). Con dependencias,
+    `cargador(*datos_dependencias)` devuelve los datos y la versión es la de
+    sus dependencias, así que solo se reconstruye cuando estas cambian. Con
+    `con_version` el cargador recibe además esa versión como `version=`.
+    Si hay `actualizador`, al cambiar las dependencias primero se prueba
+    `actualizador(conjunto_anterior, *conjuntos_dependencias)`, que devuelve
+    los datos nuevos a partir de los anteriores o None para reconstruir.
+    """
+    _definiciones[nombre] = _Definicion(cargador, depende_de, actualizador, con_version)
+
+
+def _vigente(conjunto):
+    return conjunto is not None and time.monotonic() - conjunto.validado_en < TTL_REVALIDACION
+
+
+def _bases(nombre):
+    definicion = _definiciones[nombre]
+    if not definicion.depende_de:
+        return {nombre}
+    return set().union(*(_bases(dep) for dep in definicion.depende_de))
+
+
+def _profundidad(nombre):
+    definicion = _definiciones[nombre]
+    return 1 + max((_profundidad(dep) for dep in definicion.depende_de), default=-1)
+
+
+def _cargar_bases(nombre):
+    # Con más de una fuente sin cargar, la espera es la de la más lenta y no la suma
+    faltantes = [base for base in sorted(_bases(nombre)) if base not in _conjuntos]
+    if len(faltantes) > 1:
+        for futuro in [_pool.submit(instrumentacion.en_ejecucion_actual(obtener), base) for base in faltantes]:
+            futuro.result()
+
+
+def _cargar_base(nombre, actual):
+    with instrumentacion.etapa(f"registro.{nombre}"):
+        version, datos = _definiciones[nombre].cargador()
+    if actual is not None and actual.version == version:
+        # El origen no cambió: se conserva el mismo objeto
+        instrumentacion.contar(f"registro.{nombre}", "revalidado")
+        datos = actual.datos
+    else:
+        instrumentacion.contar(f"registro.{nombre}", "fallo")
+    return Conjunto(nombre, version, datos)
+
+
+def _construir_derivado(nombre, actual, dependencias):
+    definicion = _definiciones[nombre]
+    version = "+".join(dep.version for dep in dependencias)
+    datos = None
+    if actual is not None and definicion.actualizador is not None:
+        with instrumentacion.etapa(f"registro.{nombre}.actualizacion"):
+            datos = definicion.actualizador(actual, *dependencias)
+        if datos is not None:
+            instrumentacion.contar(f"registro.{nombre}", "actualizado")
+    if datos is None:
+        instrumentacion.contar(f"registro.{nombre}", "fallo")
+        extra = {"version": version} if definicion.con_version else {}
+        with instrumentacion.etapa(f"registro.{nombre}"):
+            datos = definicion.cargador(*[dep.datos for dep in dependencias], **extra)
+    return Conjunto(nombre, version, datos, {dep.nombre: dep for dep in dependencias})
+
+
+def obtener(nombre):
+    """Devuelve el `Conjunto` de `nombre`, cargándolo si hace falta.
+
+    Solo espera la carga si el conjunto nunca se cargó: uno vencido se entrega
+    igual y se revalida en el hilo de fondo.
+    """
+    _iniciar_refresco()
+    definicion = _definiciones[nombre]
+    if not definicion.depende_de:
+        actual = _conjuntos.get(nombre)
+        if actual is None:
+            with definicion.lock:
+                actual = _conjuntos.get(nombre)
+                if actual is None:
+                    actual = _conjuntos[nombre] = _cargar_base(nombre, None)
+                    return actual
+        if _vigente(actual):
+            instrumentacion.contar(f"registro.{nombre}", "acierto")
+        else:
+            instrumentacion.contar(f"registro.{nombre}", "vencido")
+            _despertar.set()
+        return actual
+
+    _cargar_bases(nombre)
+    dependencias = [obtener(dep) for dep in definicion.depende_de]
+    version = "+".join(dep.version for dep in dependencias)
+    actual = _conjuntos.get(nombre)
+    if actual is not None and actual.version == version:
+        instrumentacion.contar(f"registro.{nombre}", "acierto")
+        return actual
+    with definicion.lock:
+        actual = _conjuntos.get(nombre)
+        if actual is not None and actual.version == version:
+            instrumentacion.contar(f"registro.{nombre}", "acierto")
+            return actual
+        _conjuntos[nombre] = _construir_derivado(nombre, actual, dependencias)
+        return _conjuntos[nombre]
+
+
+def refrescar(forzar=False):
+    """Revalida los conjuntos base cargados que están por vencer (o todos, con `forzar`).
+
+    Los derivados cargados se reconstruyen con las bases nuevas antes de
+    publicar nada, y todos se publican juntos. Si un conjunto falla se
+    conservan el anterior y sus derivados, y se reintenta en el próximo
+    refresco. Devuelve {nombre: excepción} de los que fallaron.
+    """
+    with _lock_refresco:
+        actuales = dict(_conjuntos)
+        limite = TTL_REVALIDACION - ANTICIPACION_REFRESCO
+        por_refrescar = [
+            nombre for nombre, conjunto in actuales.items()
+            if not _definiciones[nombre].depende_de and (forzar or time.monotonic() - conjunto.validado_en >= limite)
+        ]
+        nuevos, errores = {}, {}
+        futuros = {nombre: _pool.submit(_cargar_base, nombre, actuales[nombre]) for nombre in por_refrescar}
+        for nombre, futuro in futuros.items():
+            try:
+                nuevos[nombre] = futuro.result()
+            except Exception as e:
+                instrumentacion.contar(f"registro.{nombre}", "error")
+                errores[nombre] = e
+
+        derivados = sorted((nombre for nombre in actuales if _definiciones[nombre].depende_de), key=_profundidad)
+        for nombre in derivados:
+            dependencias = [nuevos.get(dep, actuales.get(dep)) for dep in _definiciones[nombre].depende_de]
+            if any(dep is None for dep in dependencias) or any(dep in errores for dep in _definiciones[nombre].depende_de):
+                continue
+            if "+".join(dep.version for dep in dependencias) == actuales[nombre].version:
+                continue
+            try:
+                nuevos[nombre] = _construir_derivado(nombre, actuales[nombre], dependencias)
+            except Exception as e:
+                instrumentacion.contar(f"registro.{nombre}", "error")
+                errores[nombre] = e
+
+        # Si un derivado falló tampoco se publican sus bases nuevas ni lo construido con ellas,
+        # para no dejarlo desfasado: todo eso se reintenta en el próximo refresco
+        descartadas = set().union(*(_bases(nombre) for nombre in errores if _definiciones[nombre].depende_de))
+        nuevos = {nombre: conjunto for nombre, conjunto in nuevos.items() if not _bases(nombre) & descartadas}
+        _conjuntos.update(nuevos)
+        return errores
+
+
+def _bucle_refresco():
+    while True:
+        _despertar.wait(INTERVALO_REFRESCO)
+        _despertar.clear()
+        try:
+            refrescar()
+        except Exception:
+            # El hilo no debe terminar: el próximo ciclo lo vuelve a intentar
+            instrumentacion.contar("registro.refresco", "error")
+
+
+def _iniciar_refresco():
+    global _hilo_refresco
+    if _hilo_refresco is None:
+        with _lock_hilo:
+            if _hilo_refresco is None:
+                _hilo_refresco = threading.Thread(target=_bucle_refresco, name="registro-refresco", daemon=True)
+                _hilo_refresco.start()
+
+
+def memoria():
+    """Bytes en memoria de cada conjunto cargado que es un DataFrame (incluye el contenido de los textos)."""
+    return {
+        nombre: int(conjunto.datos.memory_usage(deep=True).sum())
+        for nombre, conjunto in list(_conjuntos.items())
+        if isinstance(conjunto.datos, pd.DataFrame)
+    }
+
+
+def _cargar_importaciones():
+    version, df = descargas.cargar_csv("importaciones.csv")
+    df = df.set_axis(df.columns.str.strip(), axis=1).assign(
+        Fecha_Importacion=lambda d: pd.to_datetime(d['Fecha_Importacion']).dt.strftime('%Y-%m-%d'),
+        # Reemplazar valores vacíos en la columna PRODUCTO con "Sin especificar"
+        PRODUCTO=lambda d: d['PRODUCTO'].fillna('Sin especificar'),
+    )
+    return version, df
+
+
+def _actualizar_cubo_ventas(anterior, ventas):
+    # Si ventas solo cambió por órdenes anexadas, se suman al cubo en vez de reconstruirlo
+    incremento = preprocesamiento.incremento(anterior.version, ventas.version)
+    if incremento is None:
+        return None
+    return anterior.datos.actualizar(incremento.quitadas, incremento.nuevas)
+
+
+def _actualizar_indice_ventas(anterior, ventas):
+    incremento = preprocesamiento.incremento(anterior.version, ventas.version)
+    if incremento is None:
+        return None
+    return anterior.datos.anexar(ventas.datos, incremento.nuevas.index[0])
+
+
+def _construir_indice_ventas(df):
+    columnas = [col for col in cubo_ventas.DIMENSIONES[1:] + ['ID'] if col in df.columns]
+    return indice_filtros.IndiceFiltros(df, columnas)
+
+
+def _abrir_motor_sqlite(ventas, importaciones, categorias, version):
+    # La base se guarda por versión de sus fuentes y se reutiliza entre reinicios
+    return motor_ventas.MotorSQLite.abrir(ventas, categorias, importaciones, descargas.DIR_CACHE, version)
+
+
+# Conjuntos del dashboard
+registrar("ventas", preprocesamiento.cargar_ventas)
+registrar("importaciones", _cargar_importaciones)
+registrar("categorias", lambda: descargas.cargar_csv("categorias.csv"))
+registrar("cubo_ventas", cubo_ventas.CuboVentas.construir, depende_de=["ventas"], actualizador=_actualizar_cubo_ventas)
+registrar("indice_ventas", _construir_indice_ventas, depende_de=["ventas"], actualizador=_actualizar_indice_ventas)
+# Venta de cada lote importado y su resumen por fecha y categoría para el gráfico de Importaciones
+registrar("venta_lotes", venta_lotes.calcular, depende_de=["importaciones", "ventas"])
+registrar("venta_categorias", venta_lotes.por_categoria, depende_de=["venta_lotes"])
+# Motor de consultas de la página de Ventas según OG_APP_MOTOR
+if motor_ventas.MOTOR == "sqlite":
+    registrar("motor_ventas", _abrir_motor_sqlite, depende_de=["ventas", "importaciones", "categorias"], con_version=True)
+else:
+    registrar("motor_ventas", motor_ventas.MotorPandas, depende_de=["ventas", "cubo_ventas", "indice_ventas"])
@@ -0,0 +1,212 @@
+"""Reportes exportables de Ventas e Importaciones, generados en un proceso aparte.
+
+Este módulo no depende de Streamlit porque el proceso de reportes lo importa.
+Las hojas se escriben por bloques: en Excel con el modo write-only de openpyxl
+y en CSV como un zip con un archivo por hoja, así que el detalle de un rango
+grande nunca está entero en memoria. El detalle de ventas se lee del snapshot
+Feather con memory mapping en vez de enviarse al proceso, a través de un enlace
+duro que lo mantiene aunque en el medio se publique otra versión y se borre.
+"""
+import glob
+import io
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import openpyxl
+import pyarrow.feather as feather
+
+# Formato elegido: (extensión, tipo MIME)
+FORMATOS = {
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('zip', 'application/zip'),
+}
+# Filas por bloque al escribir el detalle
+FILAS_BLOQUE = 50_000
+# Filas de datos por hoja de Excel (el límite es 1.048.576 con el encabezado); el resto sigue en otra hoja
+MAX_FILAS_HOJA = 1_048_575
+REPORTES_SIMULTANEOS = 2
+# Segundos que se conserva un reporte (o un enlace al snapshot) antes de borrarlo aunque su sesión no lo haya hecho
+ANTIGUEDAD_MAXIMA = 6 * 3600
+PREFIJO = "og-app-reporte-"
+
+_proceso = None
+_lock = threading.Lock()
+_enlaces = itertools.count()
+
+
+class Filas:
+    """Filas `posiciones` del archivo Feather `ruta`, que el proceso de reportes lee por bloques.
+
+    Si `temporal`, `ruta` se borra cuando termina el trabajo que la recibe.
+    """
+
+    def __init__(self, ruta, posiciones, temporal=False):
+        self.ruta = ruta
+        self.posiciones = np.asarray(posiciones, dtype=np.int64)
+        self.temporal = temporal
+
+
+def fijar(ruta, posiciones):
+    """`Filas` de un enlace duro a `ruta`, que sigue existiendo aunque se borre `ruta`.
+
+    Devuelve None si no se pudo enlazar (`ruta` ya se borró o el sistema de
+    archivos no admite enlaces duros); en ese caso hay que enviar las filas.
+    """
+    # Junto al original (un enlace duro no cruza sistemas de archivos) y con un nombre
+    # que no coincide con el de los snapshots, así no lo borra el que escribe la versión siguiente
+    _limpiar(os.path.join(os.path.dirname(ruta), "*.reporte"))
+    enlace = f"{ruta}.{os.getpid()}-{next(_enlaces)}.reporte"
+    try:
+        os.link(ruta, enlace)
+    except OSError:
+        return None
+    return Filas(enlace, posiciones, temporal=True)
+
+
+class Trabajo:
+    def __init__(self, ruta, formato, futuro):
+        self.ruta = ruta
+        self.formato = formato
+        self.futuro = futuro
+
+    @property
+    def extension(self):
+        return FORMATOS[self.formato][0]
+
+    @property
+    def mime(self):
+        return FORMATOS[self.formato][1]
+
+
+def _bloques(datos):
+    if isinstance(datos, Filas):
+        tabla = feather.read_table(datos.ruta, memory_map=True)
+        for inicio in range(0, max(len(datos.posiciones), 1), FILAS_BLOQUE):
+            yield tabla.take(datos.posiciones[inicio:inicio + FILAS_BLOQUE]).to_pandas()
+    else:
+        for inicio in range(0, max(len(datos), 1), FILAS_BLOQUE):
+            yield datos.iloc[inicio:inicio + FILAS_BLOQUE]
+
+
+def _hoja_nueva(libro, nombre, n, columnas):
+    hoja = libro.create_sheet(nombre if n == 1 else f"{nombre} ({n})")
+    hoja.append(columnas)
+    return hoja
+
+
+def _escribir_xlsx(ruta, hojas):
+    libro = openpyxl.Workbook(write_only=True)
+    for nombre, datos in hojas:
+        hoja, n, filas = None, 0, 0
+        for bloque in _bloques(datos):
+            if hoja is None:
+                n += 1
+                hoja = _hoja_nueva(libro, nombre, n, [str(col) for col in bloque.columns])
+            # openpyxl no acepta NaN/NaT ni categorías: se pasan como objetos y None
+            valores = bloque.astype(object).where(bloque.notna(), None)
+            for fila in valores.itertuples(index=False, name=None):
+                if filas == MAX_FILAS_HOJA:
+                    n += 1
+                    hoja, filas = _hoja_nueva(libro, nombre, n, [str(col) for col in bloque.columns]), 0
+                hoja.append(fila)
+                filas += 1
+    libro.save(ruta)
+
+
+def _escribir_csv(ruta, hojas):
+    with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, datos in hojas:
+            # utf-8 con BOM para que Excel reconozca los acentos al abrir el CSV
+            with archivo.open(f"{nombre}.csv", 'w') as binario, io.TextIOWrapper(binario, encoding='utf-8-sig', newline='') as texto:
+                encabezado = True
+                for bloque in _bloques(datos):
+                    bloque.to_csv(texto, index=False, header=encabezado)
+                    encabezado = False
+
+
+def _escribir(ruta, formato, hojas):
+    if formato == 'Excel':
+        _escribir_xlsx(ruta, hojas)
+    else:
+        _escribir_csv(ruta, hojas)
+
+
+def reporte_ventas(ruta, formato, resumen, por_sku, por_dia, detalle):
+    """Resumen de filtros y KPIs, KPIs por SKU y por día, y las líneas de venta (DataFrame o `Filas`)."""
+    _escribir(ruta, formato, [
+        ('Resumen', resumen),
+        ('Por SKU', por_sku),
+        ('Por día', por_dia),
+        ('Detalle', detalle),
+    ])
+
+
+def reporte_importaciones(ruta, formato, totales, detalle, lotes):
+    """Totales por fecha, detalle por categoría y producto, y la venta de cada lote (si está disponible)."""
+    hojas = [('Totales por fecha', totales), ('Detalle', detalle)]
+    if lotes is not None:
+        hojas.append(('Venta por lote', lotes))
+    _escribir(ruta, formato, hojas)
+
+
+def _pool():
+    global _proceso
+    with _lock:
+        if _proceso is None:
+            # spawn: el proceso no hereda los hilos ni la memoria del servidor de Streamlit
+            _proceso = ProcessPoolExecutor(REPORTES_SIMULTANEOS, mp_context=multiprocessing.get_context("spawn"))
+        return _proceso
+
+
+def _limpiar(patron):
+    # Archivos de sesiones que terminaron sin generar otro reporte, o de procesos anteriores.
+    # Se mira st_ctime porque crear un enlace duro la actualiza (el mtime es el del snapshot)
+    limite = time.time() - ANTIGUEDAD_MAXIMA
+    for ruta in glob.glob(patron):
+        try:
+            if os.stat(ruta).st_ctime < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def enviar(funcion, formato, *args):
+    """Ejecuta `funcion(ruta, formato, *args)` en el proceso de reportes y devuelve su `Trabajo`.
+
+    De paso borra los reportes de más de ANTIGUEDAD_MAXIMA segundos.
+    """
+    global _proceso
+    _limpiar(os.path.join(tempfile.gettempdir(), PREFIJO + "*"))
+    fd, ruta = tempfile.mkstemp(prefix=PREFIJO, suffix="." + FORMATOS[formato][0])
+    os.close(fd)
+    try:
+        futuro = _pool().submit(funcion, ruta, formato, *args)
+    except BrokenProcessPool:
+        # Un proceso murió (por ejemplo por falta de memoria): se arma uno nuevo
+        with _lock:
+            _proceso = None
+        futuro = _pool().submit(funcion, ruta, formato, *args)
+    for arg in args:
+        if isinstance(arg, Filas) and arg.temporal:
+            futuro.add_done_callback(lambda _, ruta=arg.ruta: _borrar_archivo(ruta))
+    return Trabajo(ruta, formato, futuro)
+
+
+def _borrar_archivo(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def borrar(trabajo):
+    """Borra el archivo de un trabajo que ya terminó."""
+    _borrar_archivo(trabajo.ruta)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+import kpis
+
+# Granularidades disponibles en el gráfico de desarrollo de ventas
+FRECUENCIAS = {
+    'Día': dict(freq='D'),
+    'Semana': dict(freq='W-MON', label='left', closed='left'),  # semanas de lunes a domingo
+    'Mes': dict(freq='MS'),
+}
+TITULOS = {'Día': 'Diario', 'Semana': 'Semanal', 'Mes': 'Mensual'}
+FORMATOS_FECHA = {'Día': '%d-%m-%Y', 'Semana': '%d-%m-%Y', 'Mes': '%m-%Y'}
+
+
+def agregar_series(df, granularidad='Día', columna_fecha='Fecha'):
+    """Ventas_Totales, Ventas_Netas y Ganancia_Neta por período en una sola pasada.
+
+    `df` debe tener la columna de fecha y las medidas 'Ventas Totales' y
+    'Ventas Netas' (por ejemplo, las celdas del cubo de ventas).
+    """
+    series = (
+        df.groupby(pd.Grouper(key=columna_fecha, **FRECUENCIAS[granularidad]))[['Ventas Totales', 'Ventas Netas']]
+        .sum()
+        .rename(columns={'Ventas Totales': 'Ventas_Totales', 'Ventas Netas': 'Ventas_Netas'})
+    )
+    series['Ganancia_Neta'] = series['Ventas_Netas'] - (series['Ventas_Netas'] * kpis.IMPUESTO)
+    return series.rename_axis('Fecha').reset_index()
@@ -0,0 +1,78 @@
+import numpy as np
+import streamlit as st
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+SIN_ORDEN = "(sin orden)"
+# Órdenes calculados que se guardan por sesión (uno por estado de filtros/búsqueda/orden)
+MAX_ORDENES_GUARDADOS = 8
+
+
+def _calcular_posiciones(df, posiciones, busqueda, columnas_busqueda, columna_orden, ascendente):
+    # Solo se toman de `df` las filas `posiciones` de las columnas buscadas u ordenadas
+    if busqueda:
+        coincide = np.zeros(len(posiciones), dtype=bool)
+        for col in columnas_busqueda:
+            coincide |= df[col].iloc[posiciones].astype(str).str.contains(busqueda, case=False, regex=False).to_numpy()
+        posiciones = posiciones[coincide]
+    if columna_orden != SIN_ORDEN:
+        valores = df[columna_orden].iloc[posiciones].reset_index(drop=True)
+        orden = valores.sort_values(ascending=ascendente, na_position='last', kind='stable').index.to_numpy()
+        posiciones = posiciones[orden]
+    return posiciones
+
+
+def _guardado(clave, key, calcular):
+    # Orden, búsqueda y totales se calculan en el servidor y se guardan por estado de filtros
+    guardados = st.session_state.setdefault(f"_{key}_ordenes", {})
+    if clave in guardados:
+        guardados[clave] = guardados.pop(clave)  # Más reciente al final
+    else:
+        guardados[clave] = calcular()
+        while len(guardados) > MAX_ORDENES_GUARDADOS:
+            guardados.pop(next(iter(guardados)))
+    return guardados[clave]
+
+
+def tabla_paginada(df, clave_estado, key="tabla", posiciones=None):
+    """Muestra las filas `posiciones` de `df` (todas si es None) paginadas.
+
+    `posiciones` puede ser un array o un objeto con `contar()`, `pagina(inicio, n)`
+    y `todas()` (como motor_ventas.FilasSeleccion): sin búsqueda ni orden se piden
+    solo el total y la página visible, y todas las posiciones recién al buscar u
+    ordenar. Solo se copian de `df` las filas de la página visible, y las columnas
+    buscadas u ordenadas de las filas seleccionadas. `clave_estado` identifica los
+    datos y filtros que produjeron `posiciones`; se usa para reutilizar el orden
+    ya calculado mientras no cambie.
+    """
+    if posiciones is None:
+        posiciones = np.arange(len(df))
+    columnas = st.multiselect("Columnas", list(df.columns), default=list(df.columns), key=f"{key}_columnas")
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    busqueda = col1.text_input("Buscar", "", key=f"{key}_busqueda").strip()
+    columna_orden = col2.selectbox("Ordenar por", [SIN_ORDEN] + list(df.columns), key=f"{key}_orden")
+    ascendente = col3.checkbox("Ascendente", value=True, key=f"{key}_ascendente")
+    tamano = col4.selectbox("Filas por página", TAMANOS_PAGINA, key=f"{key}_tamano")
+
+    perezosas = not isinstance(posiciones, np.ndarray)
+    if perezosas and not busqueda and columna_orden == SIN_ORDEN:
+        # Sin búsqueda ni orden basta el total y la página visible, sin traer todas las posiciones
+        ordenadas = None
+        total = _guardado((clave_estado,), key, posiciones.contar)
+    else:
+        ordenadas = _guardado(
+            (clave_estado, busqueda, tuple(columnas), columna_orden, ascendente), key,
+            lambda: _calcular_posiciones(
+                df, posiciones.todas() if perezosas else posiciones, busqueda, columnas, columna_orden, ascendente
+            ),
+        )
+        total = len(ordenadas)
+
+    n_paginas = max(1, -(-total // tamano))
+    if st.session_state.get(f"{key}_pagina", 1) > n_paginas:
+        st.session_state[f"{key}_pagina"] = 1
+    pagina = st.number_input("Página", min_value=1, max_value=n_paginas, key=f"{key}_pagina")
+    inicio = (pagina - 1) * tamano
+
+    visibles = posiciones.pagina(inicio, tamano) if ordenadas is None else ordenadas[inicio:inicio + tamano]
+    st.dataframe(df.iloc[visibles, df.columns.get_indexer(columnas)], use_container_width=True)
+    st.caption(f"Página {pagina} de {n_paginas} · {total} filas")
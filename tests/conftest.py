@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Los módulos de la app están en la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def pytest_addoption(parser):
+    # Las usa benchmarks.paridad_motores para correr test_motor_ventas.py con otros datos
+    grupo = parser.getgroup("paridad", "paridad de los motores de consulta")
+    grupo.addoption("--paridad-directorio", default=RAIZ, help="directorio con los CSV (por defecto los del repositorio)")
+    grupo.addoption("--paridad-casos", type=int, default=25, help="casos aleatorios de rango de fechas y filtros")
+    grupo.addoption("--paridad-seed", type=int, default=0)
@@ -0,0 +1,106 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import cubo_ventas
+import indice_filtros
+import kpis
+import motor_ventas
+import preprocesamiento
+from conftest import RAIZ
+
+# Dos órdenes en Metropolitana y una en Valparaíso; montos con coma decimal, margen con punto
+DATASOURCE = (
+    "ID,Estado del Pago,Fecha,Moneda,SKU del Producto,Cantidad de Productos,Precio del Producto,"
+    "Rentabilidad del producto,Margen del producto (%),Descuento del producto,Región de Envío,"
+    "Nombre del método de envío,Cupones,Nombre de Pago,Rut\n"
+    '1,Pagado,2024-08-01 10:00,CLP,SKU_A,2,"1000,00","500,00",50,"100,00",Metropolitana,Correo,,Webpay,1\n'
+    '1,,,,SKU_B,1,"500,00","200,00",40,"0,00",,,,,\n'
+    '2,Pagado,2024-08-02 11:00,CLP,SKU_A,1,"2000,00","500,00",25,"200,00",Valparaíso,Correo,,Webpay,2\n'
+    '3,Pagado,2024-08-03 12:00,CLP,SKU_B,3,"100,00","10,00",10,"0,00",Metropolitana,Correo,,Webpay,3\n'
+)
+CATEGORIAS = "Categoria,Sub-Categoria,SKU del Producto\nFaldas,Falda Short,SKU_A\nPoleras,Polera Basica,SKU_B\n"
+
+
+def _motor(ventas):
+    return motor_ventas.MotorPandas(
+        ventas, cubo_ventas.CuboVentas.construir(ventas),
+        indice_filtros.IndiceFiltros(ventas, cubo_ventas.DIMENSIONES[1:] + ['ID']),
+    )
+
+
+def _todo(motor, ventas):
+    return motor.seleccionar(ventas['Fecha'].min(), ventas['Fecha'].max())
+
+
+def test_csv_del_repositorio():
+    ventas = preprocesamiento.preprocess_data(
+        preprocesamiento.leer_datasource(os.path.join(RAIZ, 'datasource.csv')),
+        pd.read_csv(os.path.join(RAIZ, 'categorias.csv')),
+    )
+    motor = _motor(ventas)
+    resultado = kpis.calcular(motor.totales(_todo(motor, ventas)))
+    assert resultado['Ventas Totales'] == pytest.approx(26_579_030)
+    assert resultado['Ventas Netas'] == pytest.approx(13_879_062.04)
+    assert resultado['Ordenes'] == 234
+    assert resultado['Margen'] == pytest.approx(59.63, abs=0.005)
+    assert kpis.de_lineas(ventas) == pytest.approx(resultado)
+
+
+def test_calcular_a_mano():
+    resultado = kpis.calcular({
+        'Ventas Totales': 1000.0, 'Descuentos': 100.0, 'Ventas Netas': 800.0, 'Costo': 200.0, 'Cantidad': 5.0, 'Ordenes': 2,
+    })
+    assert resultado == pytest.approx({
+        'Ventas Totales': 1000, 'Descuentos': 100, 'Ventas Netas': 800, 'Ventas Netas Después de Impuestos': 648,
+        'Ordenes': 2, 'Costo': 200, 'Ganancia Bruta': 600, 'Ganancia Neta': 486, 'Margen': 75,
+        'Cantidad': 5, 'Descuento Promedio': 10,
+    })
+    assert list(resultado) == kpis.KPIS
+
+
+@pytest.mark.parametrize('ventas_netas', [0.0, -50.0])
+def test_margen_cero_sin_ventas_netas_positivas(ventas_netas):
+    resultado = kpis.calcular({
+        'Ventas Totales': 100.0, 'Descuentos': 150.0, 'Ventas Netas': ventas_netas, 'Costo': 20.0, 'Cantidad': 1.0, 'Ordenes': 1,
+    })
+    assert resultado['Margen'] == 0
+    assert resultado['Ganancia Bruta'] == ventas_netas - 20
+
+
+@pytest.mark.parametrize('ventas_totales', [0.0, -10.0])
+def test_descuento_promedio_cero_sin_ventas_totales_positivas(ventas_totales):
+    resultado = kpis.calcular({
+        'Ventas Totales': ventas_totales, 'Descuentos': 5.0, 'Ventas Netas': 0.0, 'Costo': 0.0, 'Cantidad': 0.0, 'Ordenes': 0,
+    })
+    assert resultado['Descuento Promedio'] == 0
+    assert resultado['Margen'] == 0
+
+
+def test_por_segmento_a_mano():
+    ventas = preprocesamiento.preprocess_data(
+        preprocesamiento.leer_datasource(io.StringIO(DATASOURCE)), pd.read_csv(io.StringIO(CATEGORIAS))
+    )
+    motor = _motor(ventas)
+    tabla = kpis.por_segmento(motor, _todo(motor, ventas), 'Región de Envío')
+    # Metropolitana: 2*1000 + 500 + 3*100 de ventas, netas 2*900 + 500 + 3*100, costo 2*450 + 300 + 3*90
+    esperado = pd.DataFrame({
+        'Ventas Totales': [2800.0, 2000.0],
+        'Descuentos': [100.0, 200.0],
+        'Ventas Netas': [2600.0, 1800.0],
+        'Ventas Netas Después de Impuestos': [2106.0, 1458.0],
+        'Ordenes': [2, 1],
+        'Costo': [1470.0, 1350.0],
+        'Ganancia Bruta': [1130.0, 450.0],
+        'Ganancia Neta': [915.3, 364.5],
+        'Margen': [1130 / 2600 * 100, 25.0],
+        'Cantidad': [6.0, 1.0],
+        'Descuento Promedio': [100 / 2800 * 100, 10.0],
+    }, index=pd.Index(['Metropolitana', 'Valparaíso'], name='Región de Envío'))
+    tabla.index = tabla.index.astype(object)
+    pd.testing.assert_frame_equal(tabla, esperado)
+    lineas = kpis.de_lineas(ventas, 'Región de Envío')
+    lineas.index = lineas.index.astype(object)
+    pd.testing.assert_frame_equal(lineas, esperado)
@@ -0,0 +1,150 @@
+"""Los motores pandas y SQLite dan los mismos KPIs, agrupaciones y filas.
+
+Ambos motores se arman sobre el mismo frame de ventas (los CSV del repositorio,
+u otro directorio con --paridad-directorio) y se comparan en selecciones fijas,
+incluida una vacía, y en combinaciones aleatorias de rango de fechas y filtros
+con listas vacías, valores faltantes e IDs de orden. Los KPIs por segmento de
+ambos motores también se comparan con los de kpis.de_lineas.
+"""
+import gc
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cubo_ventas
+import indice_filtros
+import kpis
+import motor_ventas
+import preprocesamiento
+
+AGRUPACIONES = [['Categoria', 'SKU del Producto'], 'SKU del Producto', 'Categoria', 'Dia', ['Región de Envío', 'Tipo de Venta']]
+SEGMENTOS = ['Región de Envío', 'Nombre de Pago']
+
+
+def pytest_generate_tests(metafunc):
+    if 'caso' in metafunc.fixturenames:
+        metafunc.parametrize('caso', range(metafunc.config.getoption('paridad_casos')))
+
+
+def _datos(directorio):
+    categorias = pd.read_csv(os.path.join(directorio, 'categorias.csv'))
+    ventas = preprocesamiento.preprocess_data(
+        preprocesamiento.leer_datasource(os.path.join(directorio, 'datasource.csv')), categorias
+    )
+    importaciones = pd.read_csv(os.path.join(directorio, 'importaciones.csv'))
+    importaciones.columns = importaciones.columns.str.strip()
+    return ventas, categorias, importaciones
+
+
+@pytest.fixture(scope='module')
+def motores(request, tmp_path_factory):
+    ventas, categorias, importaciones = _datos(request.config.getoption('paridad_directorio'))
+    pandas = motor_ventas.MotorPandas(
+        ventas,
+        cubo_ventas.CuboVentas.construir(ventas),
+        indice_filtros.IndiceFiltros(ventas, cubo_ventas.DIMENSIONES[1:] + ['ID']),
+    )
+    sqlite = motor_ventas.MotorSQLite.abrir(ventas, categorias, importaciones, tmp_path_factory.mktemp('motor'), 'paridad')
+    return ventas, pandas, sqlite
+
+
+def _dias(desde, hasta):
+    # Días completos, como los arma la página (ver motor_ventas.Seleccion)
+    return pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+
+def _rango(ventas):
+    return _dias(ventas['Fecha'].min(), ventas['Fecha'].max())
+
+
+def _caso(ventas, rng):
+    dias = ventas['Fecha'].dropna().dt.normalize().unique()
+    desde, hasta = np.sort(rng.choice(dias, 2))
+    filtros = {}
+    for col in cubo_ventas.DIMENSIONES[1:]:
+        if rng.random() < 0.35:
+            valores = pd.unique(ventas[col])
+            filtros[col] = list(rng.choice(valores, min(int(rng.integers(0, 4)), len(valores)), replace=False))
+    if rng.random() < 0.15:
+        filtros['ID'] = [int(v) for v in rng.choice(ventas['ID'].unique(), 5)]
+    return *_dias(desde, hasta), filtros
+
+
+def comparar(motores, desde, hasta, filtros, rng):
+    ventas, pandas, sqlite = motores
+    a, b = pandas.seleccionar(desde, hasta, filtros), sqlite.seleccionar(desde, hasta, filtros)
+    assert sqlite.totales(b) == pytest.approx(pandas.totales(a))
+    np.testing.assert_array_equal(sqlite.filas(b), pandas.filas(a))
+    assert sqlite.contar(b) == pandas.contar(a)
+    inicio = int(rng.integers(0, max(pandas.contar(a), 1)))
+    np.testing.assert_array_equal(sqlite.pagina(b, inicio, 25), pandas.pagina(a, inicio, 25))
+    for por in AGRUPACIONES:
+        esperado, obtenido = pandas.agrupar(a, por, kpis.MEDIDAS), sqlite.agrupar(b, por, kpis.MEDIDAS)
+        if not (esperado.empty and obtenido.empty):
+            pd.testing.assert_frame_equal(obtenido, esperado, check_exact=False, check_names=False, obj=f"agrupar({por})")
+    lineas = ventas.iloc[pandas.filas(a)]
+    for por in SEGMENTOS:
+        esperado = kpis.de_lineas(lineas, por)
+        esperado.index = esperado.index.astype(object)
+        for motor, seleccion in ((pandas, a), (sqlite, b)):
+            obtenido = kpis.por_segmento(motor, seleccion, por)
+            if not (esperado.empty and obtenido.empty):
+                pd.testing.assert_frame_equal(obtenido, esperado, check_exact=False, check_names=False, obj=f"kpis por {por}")
+
+
+def test_todo_el_rango(motores):
+    comparar(motores, *_rango(motores[0]), {}, np.random.default_rng(0))
+
+
+def test_seleccion_vacia(motores):
+    ventas, pandas, sqlite = motores
+    desde, hasta = _rango(ventas)
+    comparar(motores, desde, hasta, {'Categoria': []}, np.random.default_rng(0))
+    b = sqlite.seleccionar(desde, hasta, {'Categoria': []})
+    assert sqlite.contar(b) == 0
+    assert sqlite.totales(b)['Ordenes'] == 0
+
+
+def test_rango_parcial_con_filtros(motores):
+    ventas = motores[0]
+    desde, hasta = _rango(ventas)
+    desde, mitad = _dias(desde, desde + (hasta - desde) / 2)
+    region = ventas['Región de Envío'].dropna().mode()[0]
+    comparar(motores, desde, mitad, {'Región de Envío': [region, np.nan], 'Estado del Pago': ['Pagado']}, np.random.default_rng(0))
+
+
+def test_ids_de_orden(motores):
+    ventas = motores[0]
+    comparar(motores, *_rango(ventas), {'ID': [int(v) for v in ventas['ID'].unique()[:5]]}, np.random.default_rng(0))
+
+
+def test_casos_aleatorios(motores, caso, request):
+    rng = np.random.default_rng([request.config.getoption('paridad_seed'), caso])
+    comparar(motores, *_caso(motores[0], rng), rng)
+
+
+
+def test_motor_anterior_tras_refresco(request, tmp_path):
+    # Las sesiones abiertas siguen consultando el motor anterior, desde sus hilos, después de un refresco
+    ventas, categorias, importaciones = _datos(request.config.getoption('paridad_directorio'))
+    anterior = motor_ventas.MotorSQLite.abrir(ventas, categorias, importaciones, tmp_path, 'v1')
+    seleccion = anterior.seleccionar(*_rango(ventas))
+    esperado = anterior.totales(seleccion)
+    ruta_anterior = anterior.ruta
+    nuevo = motor_ventas.MotorSQLite.abrir(ventas, categorias, importaciones, tmp_path, 'v2')
+
+    resultado = {}
+    hilo = threading.Thread(target=lambda: resultado.update(anterior.totales(anterior.seleccionar(*_rango(ventas)))))
+    hilo.start()
+    hilo.join()
+    assert resultado == esperado
+
+    # Liberado el último motor que la usa, la base anterior se borra
+    del anterior, seleccion
+    gc.collect()
+    assert not os.path.exists(ruta_anterior)
+    assert os.path.exists(nuevo.ruta)
+    assert nuevo.contar(nuevo.seleccionar(*_rango(ventas))) == len(ventas)
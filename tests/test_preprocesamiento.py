@@ -0,0 +1,102 @@
+"""preprocess_data(leer_datasource(...)) contra la implementación original de pagina_ventas.py."""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocesamiento
+from conftest import RAIZ
+
+COLUMNAS_A_COMPLETAR = ['Estado del Pago', 'Fecha', 'Moneda', 'Región de Envío', 'Nombre del método de envío', 'Cupones', 'Nombre de Pago']
+COLUMNAS_NUMERICAS = ['Cantidad de Productos', 'Precio del Producto', 'Margen del producto (%)', 'Descuento del producto']
+
+ENCABEZADO = (
+    "ID,Estado del Pago,Fecha,Moneda,SKU del Producto,Cantidad de Productos,Precio del Producto,"
+    "Rentabilidad del producto,Margen del producto (%),Descuento del producto,Región de Envío,"
+    "Nombre del método de envío,Cupones,Nombre de Pago,Rut\n"
+)
+# Montos con coma decimal, montos y margen vacíos, y la orden 2 con los campos de la orden solo en su primera línea
+LINEAS = (
+    '1,Pagado,2024-08-01 10:15,CLP,SKU_A,2,"15000,50","10082,00",74.68,"1500,25",Metropolitana,Correo,,Webpay,154723097\n'
+    '1,,,,SKU_B,1,,"5000,00",,"0,00",,,,,\n'
+    '2,Pendiente,2024-08-02 18:40,CLP,SKU_B,3,"9990,99","4000,00",40.5,,Valparaíso,Retiro,VERANO,Transferencia,98765432\n'
+    '2,,,,SKU_A,4,"12000,00","6000,00",55.14,"1200,00",,,,,\n'
+    '2,,,,SKU_C,1,"3000,00","1000,00",10,"0,00",,,,,\n'
+    '3,Cancelada,2024-08-03 09:00,CLP,,1,"7000,00","3000,00",,"700,00",,,,Webpay,\n'
+)
+CATEGORIAS = "Categoria,Sub-Categoria,SKU del Producto\nFaldas,Falda Short,SKU_A\nPoleras,Polera Basica,SKU_B\n"
+
+
+def preprocess_original(df_main, df_categorias):
+    # La versión de pagina_ventas.py antes de preprocesamiento.py; fillna(method='ffill')
+    # por grupo se escribe como .ffill(), su equivalente en pandas actuales
+    df_main['Fecha'] = pd.to_datetime(df_main['Fecha'], errors='coerce')
+    df = pd.merge(df_main, df_categorias, on='SKU del Producto', how='left')
+    df[COLUMNAS_A_COMPLETAR] = df.groupby('ID')[COLUMNAS_A_COMPLETAR].ffill()
+    for col in COLUMNAS_NUMERICAS:
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.'), errors='coerce')
+    df['Total Productos'] = df.groupby('ID')['Cantidad de Productos'].transform('sum')
+    df['Tipo de Venta'] = df['Total Productos'].apply(lambda x: 'Mayorista' if x >= 6 else 'Detalle')
+    df['Ventas Netas'] = (df['Precio del Producto'] - df['Descuento del producto']) * df['Cantidad de Productos']
+    return df
+
+
+def _comparable(serie, como):
+    # Los tipos cambiaron (categorías, enteros angostos, float32, Rut como texto): se comparan los valores
+    if pd.api.types.is_datetime64_any_dtype(como):
+        return pd.to_datetime(serie).astype('datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(como):
+        return pd.to_numeric(serie.astype(object), errors='coerce').astype('float64')
+    return serie.astype(object).where(serie.notna(), None)
+
+
+def comparar(actual, original):
+    assert len(actual) == len(original)
+    for col in original.columns:
+        pd.testing.assert_series_equal(
+            _comparable(actual[col], original[col]).reset_index(drop=True),
+            _comparable(original[col], original[col]).reset_index(drop=True),
+            check_dtype=False, check_exact=False, rtol=1e-9, obj=col,
+        )
+    # Columnas que agregó preprocesamiento.py
+    neto = original['Precio del Producto'] - original['Descuento del producto']
+    np.testing.assert_allclose(actual['Precio Neto del Producto'].to_numpy(dtype='float64'), neto, rtol=1e-9)
+    np.testing.assert_allclose(
+        actual['Costo del Producto'].to_numpy(dtype='float64'),
+        neto * (1 - original['Margen del producto (%)'] / 100), rtol=1e-9,
+    )
+
+
+def _procesar(datasource, categorias):
+    actual = preprocesamiento.preprocess_data(
+        preprocesamiento.leer_datasource(datasource()), pd.read_csv(categorias())
+    )
+    original = preprocess_original(pd.read_csv(datasource()), pd.read_csv(categorias()))
+    return actual, original
+
+
+def test_frame_chico():
+    actual, original = _procesar(
+        lambda: io.StringIO(ENCABEZADO + LINEAS), lambda: io.StringIO(CATEGORIAS)
+    )
+    comparar(actual, original)
+    assert actual['Precio del Producto'].iloc[0] == pytest.approx(15000.5)
+    assert actual['Margen del producto (%)'].isna().tolist() == [False, True, False, False, False, True]
+    assert actual['Estado del Pago'].astype(object).tolist()[2:5] == ['Pendiente'] * 3
+    assert actual['Tipo de Venta'].astype(object).tolist() == ['Detalle'] * 2 + ['Mayorista'] * 3 + ['Detalle']
+
+
+def test_csv_del_repositorio():
+    actual, original = _procesar(
+        lambda: os.path.join(RAIZ, 'datasource.csv'), lambda: os.path.join(RAIZ, 'categorias.csv')
+    )
+    comparar(actual, original)
+
+
+def test_columnas_numericas_se_leen_como_numeros():
+    df = preprocesamiento.leer_datasource(io.StringIO(ENCABEZADO + LINEAS))
+    for col in COLUMNAS_NUMERICAS:
+        assert pd.api.types.is_float_dtype(df[col]) or pd.api.types.is_integer_dtype(df[col]), col
+    assert df['Margen del producto (%)'].tolist()[:3] == [74.68, pytest.approx(np.nan, nan_ok=True), 40.5]
@@ -0,0 +1,69 @@
+"""Venta de los lotes importados (sell-through).
+
+Un lote es el stock importado de un SKU en una fecha. Cada línea de venta se
+asigna con un as-of join al último lote de su SKU importado hasta el día de la
+venta; las ventas anteriores al primer lote de su SKU no se asignan. Un lote
+puede vender más que su stock inicial si quedaba stock de lotes anteriores:
+en ese caso el stock restante queda en 0 y el % vendido supera 100. Las
+líneas con Estado del Pago en ESTADOS_EXCLUIDOS (órdenes canceladas) no
+descuentan stock.
+"""
+import numpy as np
+import pandas as pd
+
+MEDIDAS = ['STOCK INICIAL', 'Cantidad Vendida', 'Stock Restante']
+# Estados del pago cuyas líneas no cuentan como vendidas
+ESTADOS_EXCLUIDOS = ('Cancelada',)
+
+
+def _porcentaje(vendida, stock):
+    vendida, stock = vendida.to_numpy(dtype='float64'), stock.to_numpy(dtype='float64')
+    return np.divide(vendida, stock, out=np.zeros(len(stock)), where=stock > 0) * 100
+
+
+def calcular(importaciones, ventas, estados_excluidos=ESTADOS_EXCLUIDOS):
+    """Stock inicial, cantidad vendida, stock restante y % vendido de cada lote.
+
+    `importaciones` es el conjunto de importaciones (Fecha_Importacion como
+    'YYYY-MM-DD') y `ventas` el frame de líneas de venta preprocesado. Las
+    líneas con Estado del Pago en `estados_excluidos` no se asignan a ningún lote.
+    """
+    # Las filas del mismo SKU y fecha (por ejemplo de distintas marcas) forman un lote
+    lotes = importaciones.groupby(['Fecha_Importacion', 'SKU del Producto'], dropna=False, sort=False).agg(
+        **{'CATEGORIA': ('CATEGORIA', 'first'), 'STOCK INICIAL': ('STOCK INICIAL', 'sum')}
+    ).reset_index()
+    skus = pd.Index(lotes['SKU del Producto'].dropna().unique())
+
+    # El join se hace sobre códigos enteros de SKU: las ventas lo tienen como categoría
+    codigo_venta = skus.get_indexer(ventas['SKU del Producto'])
+    lineas = pd.DataFrame({
+        'Fecha': ventas['Fecha'].to_numpy(dtype='datetime64[ns]'),
+        'sku': codigo_venta,
+        'cantidad': ventas['Cantidad de Productos'].to_numpy(dtype='float64'),
+    })
+    excluida = ventas['Estado del Pago'].isin(estados_excluidos).to_numpy()
+    lineas = lineas[(lineas['sku'] >= 0) & lineas['Fecha'].notna() & ~excluida].sort_values('Fecha', kind='stable')
+    entradas = pd.DataFrame({
+        'Fecha': pd.to_datetime(lotes['Fecha_Importacion']).to_numpy(dtype='datetime64[ns]'),
+        'sku': skus.get_indexer(lotes['SKU del Producto']),
+        'lote': np.arange(len(lotes)),
+    })
+    entradas = entradas[(entradas['sku'] >= 0) & entradas['Fecha'].notna()].sort_values('Fecha', kind='stable')
+    asignadas = pd.merge_asof(lineas, entradas, on='Fecha', by='sku', direction='backward').dropna(subset=['lote'])
+
+    vendida = np.bincount(
+        asignadas['lote'].to_numpy(dtype=np.int64),
+        weights=np.nan_to_num(asignadas['cantidad'].to_numpy()),
+        minlength=len(lotes),
+    )
+    lotes['Cantidad Vendida'] = vendida
+    lotes['Stock Restante'] = (lotes['STOCK INICIAL'] - vendida).clip(lower=0)
+    lotes['% Vendido'] = _porcentaje(lotes['Cantidad Vendida'], lotes['STOCK INICIAL'])
+    return lotes
+
+
+def por_categoria(lotes):
+    """Medidas y % vendido por fecha de importación y categoría (sin categorías vacías)."""
+    tabla = lotes.groupby(['Fecha_Importacion', 'CATEGORIA'])[MEDIDAS].sum()
+    tabla['% Vendido'] = _porcentaje(tabla['Cantidad Vendida'], tabla['STOCK INICIAL'])
+    return tabla